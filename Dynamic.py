@@ -24,16 +24,25 @@ import pyqrcode
 import requests
 import requests.utils
 import os
+import re
+import html
 import time
 import subprocess
 import json
 import csv
+import errno
 import sys
 import urllib3
 import shutil
-import glob
-from bs4 import BeautifulSoup
+import shelve
+import socket
+import queue
+import atexit
+import tempfile
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # 尝试导入lxml解析器，如果失败则使用默认解析器
 try:
@@ -41,6 +50,14 @@ try:
 except ImportError:
     etree = None
 
+# 尝试导入orjson加速JSON解析，如果失败则使用标准库json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
 # 导入重试机制相关模块
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
@@ -54,6 +71,55 @@ try:
 except Exception:
     pass
 
+# 进程内DNS缓存：B站图片/视频CDN分散在大量子域名上（i0.hdslb.com、xyN.bilivideo.com等），
+# 连接池无法跨域名复用，缓存解析结果至少省去重复的DNS查询。
+# 只在Dynamic自己的会话发送请求期间生效（见_CachedDNSAdapter），同进程中的GUI等其他代码仍直接使用系统解析
+_DNS_TTL = 300          # 解析结果缓存时间（秒）
+_DNS_CACHE_SIZE = 256   # 最多缓存的(主机, 端口)数量，超出后淘汰最久未使用的
+_dns_cache = OrderedDict()  # (主机, 端口) -> (过期时间, TCP解析结果)
+_dns_lock = threading.Lock()
+_dns_local = threading.local()
+_system_getaddrinfo = socket.getaddrinfo
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    # 非Dynamic会话的请求，或不是普通TCP解析时，直接使用系统解析
+    if not getattr(_dns_local, 'enabled', False) or type not in (0, socket.SOCK_STREAM) or proto or flags:
+        return _system_getaddrinfo(host, port, family, type, proto, flags)
+    key = (host, port)
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                _dns_cache.move_to_end(key)
+                result = hit[1]
+            else:
+                del _dns_cache[key]  # 已过期，读取时顺便删除
+                hit = None
+    if hit is None:
+        # 每个主机只按TCP缓存一份（不区分地址族），返回时再按请求的地址族过滤；解析失败直接抛出，不缓存
+        result = _system_getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with _dns_lock:
+            _dns_cache[key] = (now + _DNS_TTL, result)
+            _dns_cache.move_to_end(key)
+            while len(_dns_cache) > _DNS_CACHE_SIZE:
+                _dns_cache.popitem(last=False)
+    if family:
+        matched = [info for info in result if info[0] == family]
+        return matched or _system_getaddrinfo(host, port, family, type, proto, flags)
+    return list(result)
+
+socket.getaddrinfo = _cached_getaddrinfo
+
+class _CachedDNSAdapter(HTTPAdapter):
+    """发送请求期间为当前线程启用进程内DNS缓存的连接适配器，只挂载到Dynamic自己的会话上"""
+    def send(self, request, **kwargs):
+        _dns_local.enabled = True
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            _dns_local.enabled = False
+
 # 确定程序运行的基础目录
 if getattr(sys, 'frozen', False):
     # 如果是exe环境，使用exe所在目录
@@ -62,10 +128,67 @@ else:
     # 如果是开发环境，使用脚本所在目录
     BASEDIR = os.path.dirname(os.path.realpath(sys.argv[0]))
 
-# 获取系统文件编码
-sys_encoding = sys.getfilesystemencoding()
+# 控制台统一使用UTF-8输出（GUI按UTF-8读取子进程输出），无法编码的字符直接替换，日志输出时无需再转码
+if hasattr(sys.stdout, 'reconfigure'):
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except ValueError:
+        pass
 print(f"基础目录: {BASEDIR}")
 
+# 视频页面<title>标签匹配，标题位于<head>开头，只需扫描页面前几KB
+_TITLE_RE = re.compile(rb'<title[^>]*>([^<]+)</title>', re.I)
+_TITLE_SCAN_BYTES = 8192
+
+# Windows文件名中不允许出现的字符
+_SANITIZE_RE = re.compile(r'[\\/:*?"<>|]')
+
+# 动态图片的文件扩展名（B站图床除jpg外也会返回png/webp）
+_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# 视频页面中内嵌的播放信息 window.__playinfo__={...}</script>
+_PLAYINFO_RE = re.compile(rb'window\.__playinfo__\s*=\s*(\{.*?\})\s*;?\s*</script>', re.S)
+
+# 分钟精度的时间戳缓存 (分钟数, 格式化结果)，同一分钟内的日志不再重复调用strftime
+_ts_cache = (0, '')
+
+def _ts_minute():
+    global _ts_cache
+    minute = int(time.time() // 60)
+    if _ts_cache[0] != minute:
+        _ts_cache = (minute, datetime.now().strftime('%m/%d %H:%M'))
+    return _ts_cache[1]
+
+# 日志文件写入队列：由后台线程批量写入log.txt，调用方不再为每条日志打开一次文件
+_LOG_BATCH = 256  # 单次写入的最大日志条数
+_log_q = queue.Queue()
+
+def _log_writer():
+    log_path = os.path.join(BASEDIR, "log.txt")
+    while True:
+        batch = [_log_q.get()]
+        while len(batch) < _LOG_BATCH:
+            try:
+                batch.append(_log_q.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(batch))
+        except OSError:
+            pass
+        finally:
+            for _ in batch:
+                _log_q.task_done()
+
+def flush_log():
+    """等待队列中的日志全部写入文件"""
+    _log_q.join()
+
+threading.Thread(target=_log_writer, name='log-writer', daemon=True).start()
+# 正常退出前写完剩余日志
+atexit.register(flush_log)
+
 class Dynamic:
     """
     哔哩哔哩动态自动缓存核心类
@@ -80,6 +203,15 @@ class Dynamic:
     
     # 全局配置字典
     CONFIG = {}
+
+    # 同时轮询的UP主数量上限（并发请求数，过大容易触发B站412风控）
+    POLL_WORKERS = 4
+    # 图片等附件的并发下载线程数（所有UP主共享）
+    DOWNLOAD_WORKERS = 8
+    # 视频标题持久化缓存的最大条目数，超出后淘汰最早写入的条目
+    TITLE_CACHE_SIZE = 3000
+    # 标题缓存每新增多少条写回一次磁盘（关闭时也会写回）
+    TITLE_SYNC_EVERY = 50
     
     # 动态数据标准格式
     datajson = {
@@ -92,6 +224,37 @@ class Dynamic:
         'imagepath': [],    # 图片路径列表
         'videopath': ''     # 视频路径
     }
+    # CSV列名（预先计算，写入时直接复用）
+    _CSV_FIELDS = tuple(datajson.keys())
+
+    def __init__(self, stop_event=None, log_callback=None, interactive_login=True):
+        """
+        初始化动态监控对象
+        
+        Args:
+            stop_event: 停止信号（threading.Event），置位后监控循环在当前等待处立即退出
+            log_callback: 日志回调，设置后日志交给它显示而不输出到控制台（GUI内运行时使用）
+            interactive_login: 登录失效时是否弹出二维码窗口扫码登录；为False时只记录日志
+        """
+        self.stop_event = stop_event or threading.Event()
+        self.log_callback = log_callback
+        self.interactive_login = interactive_login
+        # 共享的下载线程池，限制同时向CDN发起的下载数量
+        self._dl_pool = ThreadPoolExecutor(max_workers=self.DOWNLOAD_WORKERS, thread_name_prefix='download')
+        # 视频标题缓存（bvid -> (写入时间, 标题)），视频发布后标题不变，重启后仍然有效
+        self._title_lock = threading.Lock()
+        self._title_cache = shelve.open(os.path.join(BASEDIR, 'static/title_cache.db'))
+        self._title_order = deque(sorted(self._title_cache.keys(), key=lambda k: self._title_cache[k][0]))
+        self._title_unsynced = 0      # 上次写回磁盘后新增的条目数
+        self._title_closed = False    # 标题缓存已关闭（之后的读取视为未命中、写入直接忽略）
+        # 已确认存在的目录，避免每次写文件前重复stat/创建
+        self._known_dirs = set()
+        # 多个轮询线程同时发现登录失效时，只允许一个线程重新登录
+        self._login_lock = threading.Lock()
+        # 轮询线程发现需要扫码登录时置位，由主线程在本轮轮询结束后弹窗登录（Tk只能在主线程中使用）
+        self._login_request = threading.Event()
+        # 本轮轮询是否已校验过登录状态（每轮开始时清除），多个线程同时遇到鉴权错误时只请求一次nav接口
+        self._cookie_checked = False
 
     def main(self):
         """
@@ -100,9 +263,21 @@ class Dynamic:
         执行流程：
         1. 初始化配置和登录状态
         2. 开始监控循环
+        3. 退出时关闭下载线程池和标题缓存
         """
-        self.init()
-        self.start()
+        try:
+            if self.init():
+                self.start()
+        finally:
+            # 等待进行中的下载结束后再关闭标题缓存，下载线程仍可能读写缓存
+            self._dl_pool.shutdown(wait=True)
+            with self._title_lock:
+                self._title_closed = True
+                self._title_cache.close()
+
+    def stop(self):
+        """通知监控循环停止，正在进行的等待会被立即打断"""
+        self.stop_event.set()
 
     def setconfig(self):
         """
@@ -129,11 +304,10 @@ class Dynamic:
                 self.log("refresh_token为空，需要重新登录")
                 return False
             
-            # 检查API登录状态
-            self.sess.headers = self.CONFIG['headers']
-            self.sess.cookies = requests.utils.cookiejar_from_dict(cookies)
+            # 检查API登录状态（在原有Cookie容器上更新，不替换会话的请求头和Cookie容器，其他线程可能正在使用）
+            self.sess.cookies.update(cookies)
             resp = self.sess.get('https://api.bilibili.com/x/web-interface/nav', timeout=10)
-            data = resp.json()
+            data = self.parse_json(resp)
             
             is_login = data.get('data', {}).get('isLogin', False)
             if not is_login:
@@ -176,9 +350,13 @@ class Dynamic:
         4. 初始化UP主动态列表
         5. 配置网络请求参数
         6. 设置重试机制
+        
+        Returns:
+            bool: 初始化成功返回True；不允许弹窗登录且Cookie无效时返回False
         """
         # 初始化成员变量
-        self.dyidlist = {}      # 存储UP主动态ID列表
+        self.dyidlist = {}      # 存储UP主已缓存的动态ID集合
+        self.lastdyid = {}      # 存储UP主CSV中最后写入的动态ID
         self.dir_path = BASEDIR # 数据存储目录
         self.sess = requests.Session()  # 创建会话对象
         
@@ -194,8 +372,7 @@ class Dynamic:
         if (self.CONFIG['datadir'] != ''):
             self.dir_path = self.CONFIG['datadir']
             # 如果目录不存在，则创建目录
-            if not os.path.exists(self.dir_path): 
-                os.makedirs(self.dir_path)
+            self.ensure_dir(self.dir_path)
 
         # 设置请求头
         self.log(self.CONFIG['headers'])
@@ -203,10 +380,13 @@ class Dynamic:
         
         # 检查cookie有效性
         if not self.check_cookie_valid():
+            if not self.interactive_login:
+                self.log("Cookie无效或未设置，请先扫码登录")
+                return False
             self.log("Cookie无效或未设置，需扫码登录")
             self.login()
             # 登录后再次设置cookie
-            self.sess.cookies = requests.utils.cookiejar_from_dict(self.CONFIG.get('Cookies', {}))
+            self.sess.cookies.update(self.CONFIG.get('Cookies', {}))
             if not self.check_cookie_valid():
                 self.log("扫码登录失败，请重启程序")
                 sys.exit(1)
@@ -224,7 +404,13 @@ class Dynamic:
             backoff_factor=1,           # 重试间隔因子
             status_forcelist=[429, 500, 502, 503, 504]  # 需要重试的HTTP状态码
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # 连接池需容纳轮询线程与下载线程的并发连接，避免keep-alive连接被丢弃后重新握手
+        adapter = _CachedDNSAdapter(
+            pool_connections=20,        # 缓存的主机连接池数量（API、passport、www及各CDN域名）
+            pool_maxsize=50,            # 每个主机保留的最大连接数
+            max_retries=retry_strategy,
+            pool_block=False
+        )
         self.sess.mount("https://", adapter)
         self.sess.mount("http://", adapter)
         
@@ -243,46 +429,106 @@ class Dynamic:
             self.CONFIG['final_dir'] = ''
         if 'move_after_combine' not in self.CONFIG:
             self.CONFIG['move_after_combine'] = False
+        return True
+
+
+    def parse_json(self, response):
+        """
+        解析接口返回的JSON
+        
+        直接解析原始字节（B站接口固定为UTF-8），跳过requests的编码探测；
+        安装了orjson时使用orjson解析。
+        返回内容不是JSON（如412风控页面、空响应）时与response.json()一样抛出
+        requests.exceptions.JSONDecodeError，它同时是RequestException，调用方按请求失败处理
+        """
+        try:
+            return json_loads(response.content)
+        except ValueError as e:
+            raise requests.exceptions.JSONDecodeError(getattr(e, 'msg', str(e)), getattr(e, 'doc', ''),
+                                                      getattr(e, 'pos', 0), response=response) from e
+
+    def refresh_cookies(self):
+        """
+        重新读取配置文件中的登录信息
+        
+        只更新Cookies和refresh_token并重新绑定到会话，
+        GUI扫码登录后无需重启监控即可生效
+        """
+        json_path = os.path.join(BASEDIR, "static/config.json")
+        try:
+            with open(json_path, 'r', encoding='utf-8') as jf:
+                config = json.load(jf)
+        except (OSError, ValueError) as e:
+            self.log(f"读取配置文件失败: {e}")
+            return
+        for key in ('Cookies', 'refresh_token'):
+            if key in config:
+                self.CONFIG[key] = config[key]
+        self.sess.cookies.update(self.CONFIG.get('Cookies', {}))
 
+    def relogin(self, known_invalid=False):
+        """
+        登录已失效时重新扫码登录，本轮已有其他线程校验过登录状态时直接返回
+        
+        在轮询线程中调用时不直接弹窗，只请求主线程在本轮轮询结束后登录
+        
+        Args:
+            known_invalid: 调用方已确认Cookie失效（主线程处理轮询线程的登录请求时），不再重复校验
+        """
+        with self._login_lock:
+            if not known_invalid:
+                # 校验在锁内进行且每轮只做一次，其余线程等锁后直接返回
+                if self._cookie_checked:
+                    return
+                self._cookie_checked = True
+                if self.check_cookie_valid():
+                    return
+            if not self.interactive_login:
+                self.log("Cookie已失效，请重新扫码登录")
+                return
+            if threading.current_thread() is not threading.main_thread():
+                self.log("Cookie已失效，本轮轮询结束后扫码登录")
+                self._login_request.set()
+                return
+            self.log("Cookie已失效，需重新扫码登录")
+            self.login()
+            self.sess.cookies.update(self.CONFIG.get('Cookies', {}))
 
 # 登陆方法
 
     def login(self):
         """扫码登录，扫码成功前阻塞"""
-        cook = {}
         # 获取二维码
         rep = self.sess.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate')
-        rep_json = rep.json()
+        rep_json = self.parse_json(rep)
         qrcode_url = rep_json['data']['url']
         token = rep_json['data']['qrcode_key']
         qrcode_path = os.path.join(BASEDIR, 'qrcode.png')
         pyqrcode.create(qrcode_url).png(qrcode_path, scale=8)
         # 弹窗显示二维码
         root, status_var = self.show_qrcode_window(qrcode_path)
+        # 登录完成信号：轮询线程置位后，Tk主线程在下一次检查时立即关闭窗口
+        login_done = threading.Event()
         def poll():
             while True:
                 try:
                     rst = self.sess.get(f'https://passport.bilibili.com/x/passport-login/web/qrcode/poll?qrcode_key={token}')
-                    j = rst.json()
+                    j = self.parse_json(rst)
                     code = j['data']['code']
                     if code == 0:
                         status_var.set("扫码成功，正在登录...")
                         self.log('登录成功')
                         self.CONFIG['refresh_token'] = j['data']['refresh_token']
-                        for co in rst.cookies:
-                            cook[co.name] = co.value
-                        self.CONFIG['Cookies'] = cook
+                        self.CONFIG['Cookies'] = {co.name: co.value for co in rst.cookies}
                         self.setconfig()
                         try:
                             os.remove(qrcode_path)
                         except Exception:
                             pass
-                        root.destroy()
+                        login_done.set()
                         return True
                     elif code == 86038:
                         status_var.set("二维码已失效，请重启程序")
-                        time.sleep(2)
-                        continue
                     elif code == 86090:
                         status_var.set("等待扫码...")
                     elif code == 86101:
@@ -291,10 +537,16 @@ class Dynamic:
                         status_var.set(f"未知状态: {code}")
                 except Exception as e:
                     status_var.set(f"网络错误: {e}")
-                time.sleep(2)
-        import threading
+                time.sleep(1)
+        def wait_login():
+            # Tk 不是线程安全的，窗口只在主线程中销毁
+            if login_done.is_set():
+                root.destroy()
+            else:
+                root.after(50, wait_login)
         t = threading.Thread(target=poll, daemon=True)
         t.start()
+        root.after(50, wait_login)
         root.mainloop()
 
 
@@ -318,12 +570,14 @@ class Dynamic:
         
         循环流程：
         1. 检查是否需要清理日志
-        2. 遍历所有UP主ID
+        2. 通过线程池并发遍历所有UP主ID
         3. 获取每个UP主的最新动态
         4. 处理新动态（下载、评论等）
         5. 休眠指定时间间隔
         """
         last_clean_time = datetime.now()  # 记录上次日志清理时间
+        # 各UP主的轮询互不依赖，用线程池并发获取，线程数限制同时请求的UP主数量
+        pool = ThreadPoolExecutor(max_workers=self.POLL_WORKERS, thread_name_prefix='poll')
         
         while True:
             current_time = datetime.now()
@@ -333,10 +587,15 @@ class Dynamic:
                 self.clean_log()
                 last_clean_time = current_time
 
-            # 遍历所有配置的UP主ID
-            for upid in self.CONFIG['bupid']:
-                self.getdata(upid=upid)  # 获取UP主动态数据
-                time.sleep(5)  # 每个UP主之间间隔5秒
+            # 并发获取所有配置的UP主动态数据，等待本轮全部完成
+            self._cookie_checked = False
+            for _ in pool.map(self.getdata, self.CONFIG['bupid']):
+                pass
+
+            # 轮询线程已确认登录失效，在主线程中直接扫码登录（不再重复校验Cookie）
+            if self._login_request.is_set():
+                self._login_request.clear()
+                self.relogin(known_invalid=True)
 
             # 首次运行后启用自动评论功能
             if not self.iscomment:
@@ -344,8 +603,11 @@ class Dynamic:
                 self.log('up id列表已更新 + 开始自动评论')
                 self.CONFIG['down-atfirst'] = self.CONFIG['autodownload']
             
-            # 按配置的间隔时间休眠
-            time.sleep(self.CONFIG['interval-sec'])
+            # 按配置的间隔时间休眠（收到停止信号时立即结束）
+            if self.stop_event.wait(self.CONFIG['interval-sec']):
+                pool.shutdown(wait=False)
+                self.log('监控已停止')
+                return
     
     def should_clean_log(self, current_time, last_clean_time):
         """判断是否应该清理日志"""
@@ -378,6 +640,8 @@ class Dynamic:
     def clean_log(self):
         """清理日志文件"""
         log_path = os.path.join(BASEDIR, "log.txt")
+        # 先写完队列中的日志，避免清空后又追加旧日志
+        flush_log()
         try:
             if os.path.exists(log_path):
                 # 获取文件大小用于记录
@@ -398,7 +662,7 @@ class Dynamic:
                 
                 # 记录清理信息到新的日志文件
                 with open(log_path, 'a', encoding='utf-8') as f:
-                    f.write(f'[{datetime.now().strftime("%m/%d %H:%M")}]: 日志文件已清空 - 原大小: {file_size_mb:.2f}MB\n')
+                    f.write(f'[{_ts_minute()}]: 日志文件已清空 - 原大小: {file_size_mb:.2f}MB\n')
                     
         except Exception as e:
             self.log(f"清空日志文件失败: {e}")
@@ -407,25 +671,27 @@ class Dynamic:
         """
         更新UP主动态ID列表
         
-        从CSV文件中读取已缓存的动态ID列表，用于判断重复下载
+        从CSV文件中读取已缓存的动态ID集合，用于判断重复下载
         
         Args:
             upid: UP主ID
             
         功能：
         1. 创建UP主目录下的CSV文件路径
-        2. 读取已缓存的动态ID列表
+        2. 读取已缓存的动态ID集合及最后写入的ID
         3. 如果是首次运行，记录日志
         4. 设置首次下载标志
         """
-        self.dyidlist[upid] = []  # 初始化UP主的动态ID列表
+        self.dyidlist[upid] = set()  # 初始化UP主的动态ID集合（O(1)判重）
+        self.lastdyid[upid] = ''
         file_path = os.path.join(self.dir_path, '{0}/{0}.csv'.format(upid))
         
         try:
             with open(file=file_path, mode='r') as c:
                 r = csv.DictReader(c)
                 for ro in r:
-                    self.dyidlist[upid].append(ro['id'])  # 添加已缓存的动态ID
+                    self.dyidlist[upid].add(ro['id'])  # 添加已缓存的动态ID
+                    self.lastdyid[upid] = ro['id']
         except FileNotFoundError:
             self.log('首次运行')  # 首次运行时CSV文件不存在
             return
@@ -440,24 +706,23 @@ class Dynamic:
             'offset': '',  # 分页偏移量
             'page': 1      # 当前页码
         }
-        
-        try:
-            # 添加超时和异常处理
-            response = self.sess.get(url=url, params=params, timeout=(10, 30))
-            data = response.json()
-        except requests.exceptions.RequestException as e:
-            self.log(f"请求UP主 {upid} 动态失败: {str(e)}")
-            return
     
         has_more = True
         while has_more:
-            data = self.sess.get(url=url, params=params, timeout=(10, 30)).json()
+            try:
+                # 添加超时和异常处理
+                data = self.parse_json(self.sess.get(url=url, params=params, timeout=(10, 30)))
+            except requests.exceptions.RequestException as e:
+                self.log(f"请求UP主 {upid} 动态失败: {str(e)}")
+                return
             
             # 未成功获取情况
             if data['code'] != 0:
                 self.log(data)
-                # 刷新下初始数据
-                self.init()
+                # 只刷新登录信息，不重新初始化（避免重读所有UP主的CSV）；仅鉴权类错误才由relogin校验登录状态
+                self.refresh_cookies()
+                if data['code'] in (-101, -400):
+                    self.relogin()
                 return
             
             # 检查是否有更多数据
@@ -473,7 +738,7 @@ class Dynamic:
             
             # 如果数据第一条是置顶动态，那么暴力计算前两条是否是更新的
             if dytype == '置顶':
-                if (self.dyidlist[upid] != [] and 
+                if (self.dyidlist[upid] and 
                     (data['data']['items'][0]['id_str'] in self.dyidlist[upid] and 
                      data['data']['items'][1]['id_str'] in self.dyidlist[upid])):
                     self.log('====')
@@ -482,45 +747,46 @@ class Dynamic:
                     continue  # 否则继续获取下一页
             
             # 如果没有更新，且没有更多数据了，则返回
-            elif (self.dyidlist[upid] != [] and 
-                  data['data']['items'][0]['id_str'] == self.dyidlist[upid][-1]):
+            elif (self.dyidlist[upid] and 
+                  data['data']['items'][0]['id_str'] == self.lastdyid[upid]):
                 self.log('====')
                 if not has_more:
                     return
                 continue
             
-            self.log(self.dyidlist[upid])
+            self.log('up[{0}] 已缓存动态数: {1}'.format(upid, len(self.dyidlist[upid])))
+            new_rows = []
             for item in data['data']['items'][::-1]:
                 dali = self.toDynamicData(item)
-                try:
-                    # 如果该动态已经获取，跳过
-                    if dali['id'] in self.dyidlist[upid]:
-                        continue
-                except Exception:
-                    self.log('QAQ')
+                # 如果该动态已经获取，跳过
+                if dali['id'] in self.dyidlist[upid]:
+                    continue
 
                 self.log('Data= id:{0},text:{1},imagepath:{2},videopath:{3},type:{4}'.format(
                     dali['id'], dali['text'], dali['imagepath'], dali['videopath'], dali['type']))
+                new_rows.append(dali)
 
+            if new_rows:
                 csv_path = os.path.join(self.dir_path, '{0}/{0}.csv'.format(upid))
                 folder_path = os.path.dirname(csv_path)
                 # 如果文件夹不存在，创建文件夹
-                if not os.path.exists(folder_path):
-                    os.makedirs(folder_path)
+                self.ensure_dir(folder_path)
                 
+                # 本页的新动态一次性追加写入CSV
                 try:
-                    if not os.path.isfile(csv_path):
-                        with open(file=csv_path, mode='a', encoding='gbk', errors='ignore', newline='') as c:
-                            w = csv.DictWriter(c, fieldnames=self.datajson.keys(), quoting=csv.QUOTE_ALL)
+                    is_new = not os.path.isfile(csv_path)
+                    with open(file=csv_path, mode='a', encoding='gbk', errors='ignore', newline='') as c:
+                        w = csv.DictWriter(c, fieldnames=self._CSV_FIELDS, quoting=csv.QUOTE_ALL)
+                        if is_new:
                             w.writeheader()
-                            self.log(dali)
-                            w.writerow(dali)
-                    else:
-                        with open(file=csv_path, mode='a', encoding='gbk', errors='ignore', newline='') as c:
-                            csv.DictWriter(c, fieldnames=self.datajson.keys(), quoting=csv.QUOTE_ALL).writerow(dali)
+                        w.writerows(new_rows)
+                    # 写入成功后同步更新内存中的已缓存ID
+                    self.dyidlist[upid].update(dali['id'] for dali in new_rows)
+                    self.lastdyid[upid] = new_rows[-1]['id']
                 except PermissionError:
                     self.log('权限不足写入失败，或许其他程序占用')
-                
+
+            for dali in new_rows:
                 # 自动评论
                 if self.iscomment and self.CONFIG['autocomment'] != '':
                     self.commentaction(dali['comment_type'], dali['aid'])
@@ -530,21 +796,21 @@ class Dynamic:
                 # 设置不自动下载附件则跳过
                 if not self.CONFIG['autodownload']:
                     continue
+                # 视频与图片并行下载，两者都完成后再处理下一条动态
+                video_future = self._dl_pool.submit(self.downvideo, upid, dali['videopath'])
                 self.downimage(upid, dali['id'], dali['imagepath'])
-                # 新增：非视频动态也移动图片
-                if dali['type'] != 'DYNAMIC_TYPE_AV' and self.CONFIG['move_after_combine'] and self.CONFIG['final_dir']:
+                video_ok = video_future.result()
+                # 新增：非视频动态也移动图片；视频动态合并时封面可能尚未下载完，合并成功后再补移一次
+                if (dali['type'] != 'DYNAMIC_TYPE_AV' or video_ok) and self.CONFIG['move_after_combine'] and self.CONFIG['final_dir']:
                     self.move_files(None, upid)  # 只移动图片
-                self.downvideo(upid, dali['videopath'])
             
             # 如果没有更多数据了，跳出循环
             if not has_more:
                 break
             
-            # 短暂延迟，避免请求过于频繁
-            time.sleep(5)
-        
-        # 更新已缓存id列表
-        self.updylist(upid)
+            # 短暂延迟，避免请求过于频繁（收到停止信号时不再翻页）
+            if self.stop_event.wait(5):
+                break
 
 
 
@@ -556,26 +822,46 @@ class Dynamic:
     def downimage(self,upid,id,path):
         if path == '' : return
 
+        # 同一条动态的多张图片并发下载，全部完成后再返回
+        futures = []
         for index,url  in enumerate(path):
             a = str(url).split('.')[-1]
             img_path = os.path.join(self.dir_path, f'{upid}/{id}_00{index+1}.{a}')
-            img = self.sess.get(url).content
-            with open(img_path,'wb') as file:
-                file.write(img)
+            futures.append(self._dl_pool.submit(self.fetch_image, url, img_path))
+        for future in futures:
+            future.result()
+
+    def fetch_image(self, url, img_path):
+        img = self.sess.get(url).content
+        with open(img_path,'wb') as file:
+            file.write(img)
+
+    def ensure_dir(self, path):
+        """确保目录存在，已确认过的目录直接跳过"""
+        if path in self._known_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._known_dirs.add(path)
 
     def sanitize_filename(self, name):
         # 替换Windows不允许的文件名字符
-        import re
-        return re.sub(r'[\\/:*?"<>|]', '_', name)
+        return _SANITIZE_RE.sub('_', name)
 
     def get_web_title(self, url, max_retries=3):
+        # 优先使用缓存的标题，避免重复下载并解析整个视频页面
+        bvid = str(url).split('/')[-2]
+        with self._title_lock:
+            cached = None if self._title_closed else self._title_cache.get(bvid)
+        if cached is not None:
+            return cached[1]
+
         for attempt in range(max_retries):
             try:
                 headers = {'User-Agent': 'Mozilla/5.0'}
-                response = self.sess.get(url, headers=headers, timeout=10)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                title = soup.title.string.strip() if soup.title and soup.title.string else "untitled"
+                title = self.read_page_title(url, headers)
                 title = title.replace("_哔哩哔哩_bilibili", "").replace("_哔哩哔哩", "").replace("_bilibili", "")
+                if title != "untitled":
+                    self.cache_title(bvid, title)
                 return title
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -583,6 +869,42 @@ class Dynamic:
                     return f"untitled_{str(url).split('/')[-2]}"
                 time.sleep(2)
 
+    def read_page_title(self, url, headers):
+        """只读取页面开头部分提取标题，匹配失败时才读取整个页面用lxml解析"""
+        with self.sess.get(url, headers=headers, timeout=10, stream=True) as response:
+            chunks = response.iter_content(chunk_size=4096)
+            head = b''
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= _TITLE_SCAN_BYTES:
+                    break
+            match = _TITLE_RE.search(head)
+            if match:
+                # 页面剩余部分不再读取：直接关闭响应，这条连接会被丢弃而不是放回连接池。
+                # 视频页面有数百KB，读完剩余内容只为复用连接并不划算；标题有缓存，只在未命中时才走到这里
+                response.close()
+                return html.unescape(match.group(1).decode('utf-8', errors='replace')).strip() or "untitled"
+            if etree is None:
+                return "untitled"
+            root = etree.HTML(head + b''.join(chunks))
+        title = root.findtext('.//title') if root is not None else None
+        return title.strip() if title and title.strip() else "untitled"
+
+    def cache_title(self, bvid, title):
+        """写入标题缓存，超过上限时按写入顺序淘汰最旧的条目；每TITLE_SYNC_EVERY条写回一次磁盘"""
+        with self._title_lock:
+            if self._title_closed:
+                return
+            if bvid not in self._title_cache:
+                self._title_order.append(bvid)
+            self._title_cache[bvid] = (time.time(), title)
+            while len(self._title_order) > self.TITLE_CACHE_SIZE:
+                del self._title_cache[self._title_order.popleft()]
+            self._title_unsynced += 1
+            if self._title_unsynced >= self.TITLE_SYNC_EVERY:
+                self._title_cache.sync()
+                self._title_unsynced = 0
+
     def downvideo(self, upid, url, max_retries=3):
         if not url:
             return False
@@ -595,8 +917,11 @@ class Dynamic:
         safe_bvid = self.sanitize_filename(bvid)
     
         # Initialize paths early to avoid UnboundLocalError
-        video_path = os.path.join(self.dir_path, f'{upid}/{safe_bvid}_video.tmp')
-        audio_path = os.path.join(self.dir_path, f'{upid}/{safe_bvid}_audio.tmp')
+        # 音视频流临时文件放在系统临时目录（通常位于SSD），合并后只有最终mp4写入数据目录
+        tmp_dir = os.path.join(tempfile.gettempdir(), 'bilibili_dynamic', upid)
+        self.ensure_dir(tmp_dir)
+        video_path = os.path.join(tmp_dir, f'{safe_bvid}_video.tmp')
+        audio_path = os.path.join(tmp_dir, f'{safe_bvid}_audio.tmp')
 
         for attempt in range(max_retries):
             try:
@@ -613,28 +938,15 @@ class Dynamic:
                             raise
                         time.sleep(3)
             
-               # 解析视频信息 - 更健壮的JSON提取
-                if etree is None:
-                    raise ValueError("lxml库未安装，无法解析视频信息")
-                _element = etree.HTML(res.content)
-                script_content = _element.xpath('//head/script[contains(text(),"window.__playinfo__")]/text()')
-                if not script_content:
+               # 解析视频信息 - 直接在页面字节中定位播放信息，无需构建整个HTML树
+                match = _PLAYINFO_RE.search(res.content)
+                if not match:
                     raise ValueError("无法找到视频信息")
             
-            # 更安全的JSON解析
-                script_text = script_content[0].split('=', 1)[1].strip()
-                if script_text.endswith(';'):
-                    script_text = script_text[:-1]
-            
                 try:
-                    video_json = json.loads(script_text)
-                except json.JSONDecodeError as e:
-                # 尝试修复常见的JSON问题
-                    try:
-                        script_text = script_text.replace('\n', '\\n').replace('\r', '\\r')
-                        video_json = json.loads(script_text)
-                    except:
-                        raise ValueError(f"JSON解析失败: {str(e)}")
+                    video_json = json_loads(match.group(1))
+                except ValueError as e:
+                    raise ValueError(f"JSON解析失败: {str(e)}")
 
                 try:
                     video_url = video_json['data']['dash']['video'][0]['baseUrl']
@@ -643,13 +955,16 @@ class Dynamic:
                     raise ValueError("无法解析视频/音频地址")
 
             # 准备目录
-                os.makedirs(os.path.join(self.dir_path, upid), exist_ok=True)
+                self.ensure_dir(os.path.join(self.dir_path, upid))
             
-            # 下载视频和音频
-                if not self.downfile(url, video_url, video_path, max_retries=3):
+            # 下载视频和音频（两路流互不依赖，并行下载）
+                with ThreadPoolExecutor(max_workers=2, thread_name_prefix='stream') as ex:
+                    video_future = ex.submit(self.downfile, url, video_url, video_path, max_retries=3)
+                    audio_future = ex.submit(self.downfile, url, audio_url, audio_path, max_retries=3)
+                if not video_future.result():
                     raise RuntimeError("视频流下载失败")
             
-                if not self.downfile(url, audio_url, audio_path, max_retries=3):
+                if not audio_future.result():
                     raise RuntimeError("音频流下载失败")
 
             # 合并文件
@@ -678,23 +993,23 @@ class Dynamic:
 
     def combineVideoAudio(self, videopath, audiopath, outpath, bvid):
         try:
-            dir = BASEDIR[0].upper() + BASEDIR[1:]
-            dir = dir.replace("\\","/")
-        
             # 确保输出目录存在
-            os.makedirs(os.path.dirname(outpath), exist_ok=True)
+            self.ensure_dir(os.path.dirname(outpath))
         
             # 检查文件是否存在
             if not os.path.exists(videopath) or not os.path.exists(audiopath):
                 raise Exception("音视频文件不存在")
         
-            # 执行ffmpeg命令
-            cmd = f'"{dir}/ffmpeg/bin/ffmpeg.exe" -y -i "{videopath}" -i "{audiopath}" -c copy "{outpath}"'
-            result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # 执行ffmpeg命令（参数列表直接启动，不经过cmd.exe；只输出错误信息）
+            ffmpeg = os.path.join(BASEDIR, 'ffmpeg', 'bin', 'ffmpeg.exe')
+            result = subprocess.run(
+                [ffmpeg, '-y', '-loglevel', 'error', '-i', videopath, '-i', audiopath, '-c', 'copy', outpath],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False
+            )
         
             if result.returncode != 0 or not os.path.exists(outpath):
                 # 合并失败，清理临时文件
-                self.log(f"FFmpeg错误: {result.stderr.decode('gbk') if result.stderr else '未知错误'}")
+                self.log(f"FFmpeg错误: {result.stderr.decode('gbk', errors='ignore') if result.stderr else '未知错误'}")
                 try:
                     if os.path.exists(videopath): os.remove(videopath)
                     if os.path.exists(audiopath): os.remove(audiopath)
@@ -736,30 +1051,44 @@ class Dynamic:
             final_dir = self.CONFIG['final_dir']
             if not final_dir:
                 return
+            # Create upid subdirectory in final_dir
+            upid_dir = os.path.join(final_dir, str(upid))
             # 只移动存在的文件
             if video_path and not os.path.exists(video_path):
                 self.log(f"待移动文件不存在: {video_path}")
             elif video_path:
-                # Create upid subdirectory in final_dir
-                upid_dir = os.path.join(final_dir, str(upid))
-                if not os.path.exists(upid_dir):
-                    os.makedirs(upid_dir)
+                self.ensure_dir(upid_dir)
                 # Move video file
                 video_name = os.path.basename(video_path)
                 dest_video = os.path.join(upid_dir, video_name)
-                shutil.move(video_path, dest_video)
+                self.move_file(video_path, dest_video)
                 self.log(f"视频已移动到: {dest_video}")
             # Move image files - using upid to find the source directory
             img_dir = os.path.join(self.dir_path, str(upid))
-            img_pattern = os.path.join(img_dir, "*.jpg")  # Match all images
-            for img_file in glob.glob(img_pattern):
-                img_name = os.path.basename(img_file)
-                dest_img = os.path.join(final_dir, str(upid), img_name)
-                shutil.move(img_file, dest_img)
-                self.log(f"图片已移动: {img_file} -> {dest_img}")
+            try:
+                entries = os.scandir(img_dir)
+            except FileNotFoundError:
+                return
+            with entries:
+                for entry in entries:
+                    if not (entry.is_file() and entry.name.lower().endswith(_IMAGE_EXTS)):
+                        continue
+                    self.ensure_dir(upid_dir)
+                    dest_img = os.path.join(upid_dir, entry.name)
+                    self.move_file(entry.path, dest_img)
+                    self.log(f"图片已移动: {entry.path} -> {dest_img}")
         except Exception as e:
             self.log(f"移动文件失败: {e}")
 
+    def move_file(self, src, dst):
+        """移动单个文件：同一磁盘内直接重命名，跨磁盘时才复制后删除"""
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dst)
+
     def downfile(self, homeurl, url, filepath, session=None, max_retries=5, timeout=60):
         if session is None:
             session = self.sess
@@ -788,15 +1117,15 @@ class Dynamic:
                     total_size = int(response.headers.get('content-length', 0)) + downloaded
                     mode = 'ab' if downloaded else 'wb'
                 
+                    # 由shutil在C层以1MB缓冲区直接把响应流复制到文件
+                    response.raw.decode_content = True
                     with open(filepath, mode) as f:
-                        for chunk in response.iter_content(chunk_size=1024*1024):  # 1MB chunks
-                            if chunk:  # 过滤keep-alive chunks
-                                f.write(chunk)
-                                downloaded += len(chunk)
+                        shutil.copyfileobj(response.raw, f, length=1024*1024)
+                        downloaded = f.tell()
             
                 # 验证文件完整性
-                if total_size > 0 and os.path.getsize(filepath) != total_size:
-                    raise ValueError(f"文件不完整，期望大小:{total_size}，实际大小:{os.path.getsize(filepath)}")
+                if total_size > 0 and downloaded != total_size:
+                    raise ValueError(f"文件不完整，期望大小:{total_size}，实际大小:{downloaded}")
                 
                 return True
             
@@ -818,52 +1147,74 @@ class Dynamic:
 
 
 
+    # 各类型动态的内容解析，md为item['modules']['module_dynamic']，da为已填好公共字段的数据
+    def parse_av(self, item, md, da):
+        # DYNAMIC_TYPE_AV 视频
+        a=''
+        try: 
+            a= md['desc']['text']
+        except (KeyError, TypeError):
+            pass
+        if a != '' :  a= '投稿动态：'+a +'\n\n'
+        archive = md['major']['archive']
+        da['title'] = a + archive['title']
+        da['text'] =  archive['desc']
+        da['imagepath'] = [archive['cover']]
+        da['videopath'] = 'https:'+archive['jump_url']
+        return da
+
+    def parse_draw(self, item, md, da):
+        # DYNAMIC_TYPE_DRAW 图文动态
+        da['title'] = '图文动态'
+        da['text'] = md['desc']['text']
+        major = md['major']
+        if (major != None):
+            da['imagepath'] = [img['src'] for img in major['draw']['items']]
+        return da
+
+    def parse_word(self, item, md, da):
+        # DYNAMIC_TYPE_WORD 文字动态
+        da['title'] = '文字动态'
+        da['text'] = md['desc']['text']
+        return da
+
+    def parse_forward(self, item, md, da):
+        # DYNAMIC_TYPE_FORWARD 转发动态
+        da['title'] = '转发的动态链接：'+str(item['orig']['id_str'])
+        da['text'] = md['desc']['text']
+        return da
+
+    def parse_unknown(self, item, md, da):
+        self.log('暂不支持的动态类型[{0}]'.format(da['type']))
+        da['text'] = '暂不支持的类型'
+        return da
+
+    # 动态类型 -> 解析方法（DYNAMIC_TYPE_ARTICLE 专栏等未列出的类型按暂不支持处理）
+    _HANDLERS = {
+        'DYNAMIC_TYPE_AV': parse_av,
+        'DYNAMIC_TYPE_DRAW': parse_draw,
+        'DYNAMIC_TYPE_WORD': parse_word,
+        'DYNAMIC_TYPE_FORWARD': parse_forward,
+    }
+
     def toDynamicData(self,item):
-        # 获取动态json的最终data格式
-        da = self.datajson.copy()
+        # 获取动态json的最终data格式（字段顺序与datajson一致）
         type = item['type']
-        da['id'] = item['id_str']
-        da['aid'] = item['basic']['comment_id_str']
-        da['comment_type'] = item['basic']['comment_type']
-        da['type'] = item['type']
-        # 根据不同动态类型，处理数据
-        # type: DYNAMIC_TYPE_AV 视频, DYNAMIC_TYPE_WORD 文字动态, DYNAMIC_TYPE_DRAW 图文动态, DYNAMIC_TYPE_ARTICLE 专栏, DYNAMIC_TYPE_FORWARD 转发动态
-
-        if (type == 'DYNAMIC_TYPE_AV' ) : 
-            a=''
-            try: 
-                a= item['modules']['module_dynamic']['desc']['text']
-            except (KeyError, TypeError):
-                pass
-            if a != '' :  a= '投稿动态：'+a +'\n\n'
-            da['title'] = a + item['modules']['module_dynamic']['major']['archive']['title']
-            da['text'] =  item['modules']['module_dynamic']['major']['archive']['desc']
-            da['imagepath'] = [item['modules']['module_dynamic']['major']['archive']['cover']]
-            da['videopath'] = 'https:'+item['modules']['module_dynamic']['major']['archive']['jump_url']
-            return da
-            
-        elif (type == 'DYNAMIC_TYPE_DRAW') : 
-            da['title'] = '图文动态'
-            da['text'] = item['modules']['module_dynamic']['desc']['text']
-            da['imagepath'] = []
-            if (item['modules']['module_dynamic']['major'] != None):
-                for img in item['modules']['module_dynamic']['major']['draw']['items']:
-                    da['imagepath'].append(img['src'])
-            return da
-        
-        elif (type == 'DYNAMIC_TYPE_WORD') : 
-            da['title'] = '文字动态'
-            da['text'] = item['modules']['module_dynamic']['desc']['text']
-            return da
-        elif (type == 'DYNAMIC_TYPE_FORWARD'):
-            da['title'] = '转发的动态链接：'+str(item['orig']['id_str'])
-            da['text'] = item['modules']['module_dynamic']['desc']['text']
-            return da
-
-        else : 
-            self.log('暂不支持的动态类型[{0}]'.format(type))
-            da['text'] = '暂不支持的类型'
-            return da   
+        basic = item['basic']
+        da = {
+            'id': item['id_str'],
+            'aid': basic['comment_id_str'],
+            'comment_type': basic['comment_type'],
+            'type': type,
+            'title': '',
+            'text': '',
+            'imagepath': [],
+            'videopath': ''
+        }
+        md = item['modules'].get('module_dynamic')
+        # 根据不同动态类型，查表调用对应的解析方法
+        handler = self._HANDLERS.get(type, Dynamic.parse_unknown)
+        return handler(self, item, md, da)
 
 
     def commentaction(self,typeid,aid):
@@ -875,8 +1226,12 @@ class Dynamic:
             'csrf' : ''
         }
         js['csrf'] = self.sess.cookies.get('bili_jct')
-        js['message'] = self.CONFIG['autocomment'] + '\n\n\n-------' + datetime.now().strftime('%m/%d %H:%M')
-        rep = self.sess.post(url='https://api.bilibili.com/x/v2/reply/add',data=js).json()
+        js['message'] = self.CONFIG['autocomment'] + '\n\n\n-------' + _ts_minute()
+        try:
+            rep = self.parse_json(self.sess.post(url='https://api.bilibili.com/x/v2/reply/add',data=js))
+        except requests.exceptions.RequestException as e:
+            self.log(f"评论失败: {e}")
+            return
         
         self.log(' {{ code: {0} , message: {1} }}'.format(rep['code'],rep['message']))
         
@@ -884,32 +1239,45 @@ class Dynamic:
         """
         记录日志信息
         
-        将日志信息同时输出到控制台和写入log.txt文件
+        将日志信息同时输出到控制台（或交给log_callback）和写入log.txt文件
         
         Args:
             text: 要记录的日志文本内容
             
         功能：
-        1. 控制台输出（带编码处理）
+        1. 控制台输出
         2. 检查是否启用日志记录
-        3. 写入日志文件（带时间戳）
+        3. 放入写入队列，由后台线程批量写入日志文件（带时间戳）
         """
-        # 控制台输出（处理编码问题）
-        try:
-            print('[{0}]: {1}\n'.format(datetime.now().strftime('%m/%d %H:%M'), text).encode('utf-8').decode(sys_encoding))
-        except UnicodeEncodeError:
-            print("编码错误")
-            pass
+        line = '[{0}]: {1}\n'.format(_ts_minute(), text)
+        if self.log_callback is not None:
+            # 在GUI中运行时直接交给界面显示
+            self.log_callback(line.strip())
+        else:
+            # 控制台输出（stdout已在启动时设为UTF-8）
+            try:
+                print(line)
+            except UnicodeEncodeError:
+                print("编码错误")
+                pass
 
         # 检查是否启用日志记录（默认启用）
         is_log_enabled = self.CONFIG.get('is_log', True)
         if not is_log_enabled:
             return 
         
-        # 写入日志文件
-        log_path = os.path.join(BASEDIR, "log.txt")
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write('[{0}]: {1}\n'.format(datetime.now().strftime('%m/%d %H:%M'), text))
+        # 交给后台线程批量写入日志文件
+        _log_q.put(line)
+
+def run(stop_event, log=None):
+    """
+    在当前线程中运行动态监控（供GUI在后台线程中调用）
+    
+    Args:
+        stop_event: 停止信号，置位后监控循环退出
+        log: 日志回调，接收每条格式化后的日志文本
+    """
+    Dynamic(stop_event, log_callback=log, interactive_login=False).main()
 
 if __name__ == '__main__':
     obj = Dynamic()
@@ -19,12 +19,33 @@
 """
 
 import os
+import copy
 import json
 import time
-import requests
-import subprocess
+import sqlite3
 import threading
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 秒精度的时间戳缓存 (秒数, 格式化结果)，同一秒内的日志不再重复调用strftime
+_ts_cache = (0, '')
+
+def _ts_second():
+    global _ts_cache
+    second = int(time.time())
+    if _ts_cache[0] != second:
+        _ts_cache = (second, datetime.now().strftime('%H:%M:%S'))
+    return _ts_cache[1]
+
+# 尝试导入orjson加速JSON解析，如果失败则使用标准库json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
 
 class BilibiliCache:
     """
@@ -37,6 +58,26 @@ class BilibiliCache:
     - 日志记录和管理
     - 存储空间监控
     """
+    # 同时请求动态接口的最大并发数
+    POLL_WORKERS = 16
+    # 已处理BV号缓存的最大条目数，超出后淘汰最久未访问的条目
+    SEEN_CAP = 4096
+    # 每写入多少条已缓存记录清理一次seen.db，使表的大小始终接近SEEN_CAP
+    SEEN_PRUNE_EVERY = 256
+    # 默认的并发下载线程数（可通过配置dl_workers修改）
+    DL_WORKERS = 4
+    # 每次检查每个UP主最新的几条动态
+    SCAN_ITEMS = 3
+    # 启用update_baseline时，连续多少次被判定"无更新"后强制完整处理一次
+    # （feed/space接口的update_num主要面向关注流，对单个UP主不一定可靠）
+    FULL_FETCH_EVERY = 10
+    # 状态信息的缓存时间（秒），短时间内重复查询直接返回上次结果
+    STATUS_TTL = 0.5
+    # 存储大小显示单位，下标i对应1024**i字节
+    _SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+    # 已解析的配置文件：路径 -> (修改时间, 文件大小, 配置)，文件未变化时不再重复解析
+    _config_cache = {}
+
     def __init__(self, config_path='static/config.json'):
         """
         初始化缓存管理对象
@@ -52,21 +93,51 @@ class BilibiliCache:
         - 设置存储空间限制
         """
         self.config_path = config_path
+        self._sess = None             # HTTP会话，首次请求时才创建（见get_session）
         self.load_config()
         self.running = False          # 运行状态标志
-        self.logs = []                # 日志记录列表
+        self._stop_event = threading.Event()  # 停止信号，置位后监控线程立即结束等待
+        self.logs = deque(maxlen=1000)  # 日志记录（最多1000条，超出自动丢弃最旧的）
         self.cached_video_count = 0   # 已缓存视频数量
         self.used_storage = 0         # 已使用存储空间（字节）
         self.max_storage = 100 * 1024 * 1024 * 1024  # 最大存储空间（100GB）
+        self._stats_lock = threading.Lock()  # 保护缓存统计，下载线程写入、状态查询读取
+        self._status_cache = (0.0, None)     # (生成时间, 状态字典)
+        self._status_dirty = True            # 统计或运行状态变化后置位，下次查询重新生成
+        self._seen = OrderedDict()    # 已缓存的BV号（LRU），避免每轮重复下载最新动态
+        # 已缓存BV号持久化到配置文件同目录的seen.db，重启后不再重复下载
+        self._seen_lock = threading.Lock()
+        self._seen_db = None          # seen.db连接，停止监控时关闭，再次使用时重新打开（见get_seen_db）
+        self._seen_inserts = 0        # 上次清理seen.db后写入的条数
+        self.load_seen()
+        self._pending = set()         # 已提交下载但尚未完成的BV号，避免同一视频重复提交
+        self._baseline = {}           # uid -> 上次返回的update_baseline，用于判断动态是否有更新
+        self._baseline_skips = {}     # uid -> 连续按update_num跳过处理的次数
+        self._inflight = {}           # uid -> 进行中请求的Future，同一UP主同时只发一个请求
+        self._inflight_lock = threading.Lock()
+        self._dl_pool = None          # 下载线程池，启动监控时创建
         
     def load_config(self):
         """
         加载配置文件
         
-        从指定路径读取JSON格式的配置文件
+        从指定路径读取JSON格式的配置文件；Cookie交给会话的cookie jar管理，请求头只保留静态部分。
+        文件的修改时间和大小未变化时直接复用上次的解析结果；
+        缓存在所有实例间共享，交给实例的是深拷贝，修改嵌套的配置项不会影响缓存和其他实例
         """
-        with open(self.config_path, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
+        st = os.stat(self.config_path)
+        key = os.path.abspath(self.config_path)
+        cached = self._config_cache.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            config = cached[2]
+        else:
+            with open(self.config_path, 'rb') as f:
+                config = json_loads(f.read())
+            self._config_cache[key] = (st.st_mtime_ns, st.st_size, config)
+        self.config = copy.deepcopy(config)
+        self._headers = dict(self.config['headers'])
+        if self._sess is not None:
+            self._sess.cookies.update(self.config['Cookies'])
     
     def add_log(self, message, log_type='info'):
         """
@@ -79,55 +150,209 @@ class BilibiliCache:
         功能：
         1. 添加时间戳
         2. 创建日志条目
-        3. 添加到日志列表
-        4. 限制日志数量（最多1000条）
+        3. 添加到日志队列（最多保留1000条）
         """
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        timestamp = _ts_second()
         log_entry = {
             'time': timestamp,
             'message': message,
             'type': log_type
         }
-        self.logs.append(log_entry)
+        self.logs.append(log_entry)  # deque已限制长度，超出时自动移除最旧的日志
+    
+    def get_seen_db(self):
+        """
+        获取seen.db连接（调用方需持有_seen_lock），未打开或已关闭时重新打开
+        """
+        if self._seen_db is None:
+            self._seen_db = sqlite3.connect(os.path.join(os.path.dirname(self.config_path), 'seen.db'),
+                                            isolation_level=None, check_same_thread=False)
+            self._seen_db.execute('CREATE TABLE IF NOT EXISTS seen(bvid TEXT PRIMARY KEY, ts INTEGER)')
+        return self._seen_db
+    
+    def prune_seen(self, db):
+        """只保留seen.db中最近的SEEN_CAP条记录（调用方需持有_seen_lock）"""
+        db.execute('DELETE FROM seen WHERE bvid NOT IN (SELECT bvid FROM seen ORDER BY ts DESC LIMIT ?)',
+                   (self.SEEN_CAP,))
+        self._seen_inserts = 0
+    
+    def close_seen_db(self, pool=None):
+        """
+        关闭seen.db连接
+        
+        Args:
+            pool: 传入下载线程池时，先等待其中正在进行的下载完成（下载完成时仍需写入seen.db）
+        """
+        if pool is not None:
+            pool.shutdown(wait=True)
+        with self._seen_lock:
+            if self._seen_db is not None:
+                self._seen_db.close()
+                self._seen_db = None
+    
+    def load_seen(self):
+        """
+        从seen.db恢复已缓存的BV号
+        
+        只保留最近的SEEN_CAP条，更早的记录直接从数据库删除
+        """
+        with self._seen_lock:
+            db = self.get_seen_db()
+            rows = db.execute(
+                'SELECT bvid FROM seen ORDER BY ts DESC LIMIT ?', (self.SEEN_CAP,)).fetchall()
+            self.prune_seen(db)
+        # 按时间从旧到新插入，使最新的条目位于LRU末尾
+        for (bvid,) in reversed(rows):
+            self._seen[bvid] = None
+    
+    def mark_seen(self, bvid):
+        """
+        记录已缓存的BV号
         
-        # 保持日志列表不超过1000条，避免内存占用过大
-        if len(self.logs) > 1000:
-            self.logs.pop(0)  # 移除最旧的日志
+        Args:
+            bvid: 视频的BV号
+            
+        超出SEEN_CAP时淘汰最久未访问的条目，同时写入seen.db，每SEEN_PRUNE_EVERY条清理一次数据库
+        """
+        with self._seen_lock:
+            self._seen[bvid] = None
+            self._seen.move_to_end(bvid)
+            if len(self._seen) > self.SEEN_CAP:
+                self._seen.popitem(last=False)
+            db = self.get_seen_db()
+            db.execute('INSERT OR REPLACE INTO seen(bvid, ts) VALUES (?, ?)', (bvid, int(time.time())))
+            self._seen_inserts += 1
+            if self._seen_inserts >= self.SEEN_PRUNE_EVERY:
+                self.prune_seen(db)
+    
+    def get_logs(self, limit=None):
+        """
+        获取日志记录
+        
+        Args:
+            limit: 只返回最新的limit条，默认返回全部
+            
+        Returns:
+            list: 日志条目列表（从旧到新）
+        """
+        if limit is None or limit >= len(self.logs):
+            return list(self.logs)
+        return list(islice(self.logs, len(self.logs) - limit, None))
+    
+    def get_session(self):
+        """
+        获取共享的HTTP会话
+        
+        requests及其依赖导入较慢，只查询状态时用不到，因此首次请求时才导入并创建会话；
+        之后复用同一个会话，轮询多个UP主时保持连接，避免每次请求重新握手
+        """
+        if self._sess is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            sess = requests.Session()
+            retry_strategy = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+            adapter = HTTPAdapter(pool_maxsize=32, max_retries=retry_strategy)
+            sess.mount('http://', adapter)
+            sess.mount('https://', adapter)
+            sess.cookies.update(self.config['Cookies'])
+            self._sess = sess
+        return self._sess
     
     def get_dynamic(self, uid):
         """
-        获取指定UP主的动态列表
+        获取指定UP主最新动态中的视频BV号
         
         Args:
             uid: UP主的用户ID
             
         Returns:
-            list: 动态列表，如果获取失败返回None
+            list: 同fetch_dynamic
+            
+        同一UP主已有请求在进行时（如网络慢导致两轮检查重叠），直接等待并复用其结果，不重复请求
+        """
+        with self._inflight_lock:
+            fut = self._inflight.get(uid)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[uid] = fut
+        if not owner:
+            return fut.result()
+        
+        try:
+            result = self.fetch_dynamic(uid)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[uid]
+    
+    def fetch_dynamic(self, uid):
+        """
+        请求接口获取指定UP主最新动态中的视频BV号
+        
+        Args:
+            uid: UP主的用户ID
+            
+        Returns:
+            list: 最新SCAN_ITEMS条动态中视频投稿的BV号，没有新动态时返回空列表，如果获取失败返回None
             
         功能：
-        1. 构建API请求URL
-        2. 设置请求头（包含认证信息）
-        3. 发送HTTP请求获取动态数据
-        4. 解析响应数据
-        5. 错误处理和日志记录
+        1. 构建API请求URL（配置use_update_baseline开启时带上次的update_baseline）
+        2. 使用静态请求头，认证Cookie由会话自动携带
+        3. 通过共享会话发送HTTP请求获取动态数据
+        4. 解析响应数据，接口报告自上次以来没有更新时直接返回空列表，
+           但连续FULL_FETCH_EVERY次后强制完整处理一次，避免接口始终报告0条时漏掉新动态
+        5. 只提取需要的BV号，完整的动态数据在请求线程内即可释放
+        6. 错误处理和日志记录
         """
         url = f'https://api.bilibili.com/x/polymer/web-dynamic/v1/feed/space?host_mid={uid}'
-        headers = {
-            **self.config['headers'],
-            'Cookie': '; '.join([f'{k}={v}' for k, v in self.config['Cookies'].items()])
-        }
+        # update_baseline默认不启用：该接口的update_num对单个UP主不一定反映新动态
+        use_baseline = self.config.get('use_update_baseline', False)
+        baseline = self._baseline.get(uid) if use_baseline else None
+        params = {'update_baseline': baseline} if baseline else None
         
         try:
-            response = requests.get(url, headers=headers)
+            response = self.get_session().get(url, params=params, headers=self._headers, timeout=(3, 10))
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 if data['code'] == 0:
-                    return data['data']['items']
+                    feed = data['data']
+                    new_baseline = feed.get('update_baseline')
+                    if use_baseline and new_baseline:
+                        self._baseline[uid] = new_baseline
+                    # 带着基线请求且接口明确返回0条更新时，跳过本次的动态处理（定期强制完整处理一次）
+                    if baseline and feed.get('update_num') == 0:
+                        skips = self._baseline_skips.get(uid, 0) + 1
+                        if skips < self.FULL_FETCH_EVERY:
+                            self._baseline_skips[uid] = skips
+                            return []
+                    self._baseline_skips[uid] = 0
+                    return self.extract_bvids(feed['items'])
             return None
         except Exception as e:
             self.add_log(f'获取动态失败: {str(e)}', 'error')
             return None
     
+    def extract_bvids(self, items):
+        """
+        从动态列表中提取视频BV号
+        
+        Args:
+            items: 接口返回的动态列表
+            
+        Returns:
+            list: 最新SCAN_ITEMS条动态中视频投稿的BV号（保持原顺序）
+        """
+        return [item['modules']['module_dynamic']['major']['archive']['bvid']
+                for item in items[:self.SCAN_ITEMS]
+                if item['type'] == 'DYNAMIC_TYPE_AV']
+    
     def download_video(self, bvid):
         """
         下载视频（模拟实现）
@@ -147,13 +372,34 @@ class BilibiliCache:
         self.add_log(f'开始下载视频: {bvid}', 'info')
         time.sleep(5)  # 模拟下载时间
         
-        # 更新缓存统计信息
-        self.cached_video_count += 1
-        # 假设每个视频平均大小为500MB
-        self.used_storage += 500 * 1024 * 1024
-        self.add_log(f'视频下载完成: {bvid} (缓存视频数: {self.cached_video_count})', 'success')
+        # 更新缓存统计信息（多个下载线程同时完成时需加锁）
+        with self._stats_lock:
+            self.cached_video_count += 1
+            # 假设每个视频平均大小为500MB
+            self.used_storage += 500 * 1024 * 1024
+            count = self.cached_video_count
+            self._status_dirty = True
+        self.add_log(f'视频下载完成: {bvid} (缓存视频数: {count})', 'success')
         return True
     
+    def download_task(self, bvid):
+        """
+        下载线程池中执行的下载任务
+        
+        Args:
+            bvid: 视频的BV号
+            
+        下载成功后记录为已缓存，无论成功与否都从待下载集合中移除
+        """
+        try:
+            if self.download_video(bvid):
+                self.mark_seen(bvid)
+        except Exception as e:
+            self.add_log(f'下载视频失败: {bvid} ({str(e)})', 'error')
+        finally:
+            with self._seen_lock:
+                self._pending.discard(bvid)
+    
     def update_status(self):
         """
         更新并返回当前状态信息
@@ -168,18 +414,33 @@ class BilibiliCache:
         - 最大存储空间
         - 磁盘使用百分比
         - 最后运行时间
+        
+        结果缓存STATUS_TTL秒，界面频繁轮询时不重复生成
         """
+        now = time.monotonic()
+        cached_at, status = self._status_cache
+        if status is not None and not self._status_dirty and now - cached_at < self.STATUS_TTL:
+            return status
+        
+        # 同一时刻读取两项统计，保证数量与占用空间一致
+        with self._stats_lock:
+            cached_video_count = self.cached_video_count
+            used_storage = self.used_storage
+            self._status_dirty = False
+        
         # 计算磁盘使用百分比
-        disk_percent = (self.used_storage / self.max_storage * 100) if self.max_storage > 0 else 0
+        disk_percent = (used_storage / self.max_storage * 100) if self.max_storage > 0 else 0
         
-        return {
+        status = {
             'is_running': self.running,
-            'cached_video_count': self.cached_video_count,
-            'used_storage': self.format_size(self.used_storage),
+            'cached_video_count': cached_video_count,
+            'used_storage': self.format_size(used_storage),
             'max_storage': self.format_size(self.max_storage),
             'disk_percent': round(disk_percent, 1),
             'last_run_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
+        self._status_cache = (now, status)
+        return status
     
     def format_size(self, size_bytes):
         """
@@ -191,19 +452,26 @@ class BilibiliCache:
         Returns:
             str: 格式化后的大小字符串（如 "1.5 GB"）
             
-        自动选择合适的单位：B, KB, MB, GB, TB
+        自动选择合适的单位：B, KB, MB, GB, TB（由二进制位数直接确定，无需循环相除）
         """
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size_bytes < 1024:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024
-        return f"{size_bytes:.1f} TB"
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f} B"
+        idx = min((int(size_bytes).bit_length() - 1) // 10, 4)
+        return f"{size_bytes / (1 << (idx * 10)):.1f} {self._SIZE_UNITS[idx]}"
     
     def start_dynamic_monitor(self):
         """启动动态监控线程"""
         if not self.running:
             self.running = True
+            self._status_dirty = True
             self.add_log('自动缓存任务启动', 'info')
+            self._stop_event.clear()
+            # 上次停止时残留的下载标记一律清除
+            with self._seen_lock:
+                self._pending.clear()
+            # 下载放到线程池中执行，慢速下载不会阻塞其他UP主的检查
+            self._dl_pool = ThreadPoolExecutor(max_workers=self.config.get('dl_workers', self.DL_WORKERS),
+                                               thread_name_prefix='dl')
             
             # 启动监控线程
             self.monitor_thread = threading.Thread(target=self.monitor_dynamics)
@@ -214,6 +482,15 @@ class BilibiliCache:
         """停止动态监控"""
         if self.running:
             self.running = False
+            self._status_dirty = True
+            self._stop_event.set()
+            # 丢弃尚未开始的下载任务
+            pool = self._dl_pool
+            pool.shutdown(wait=False, cancel_futures=True)
+            with self._seen_lock:
+                self._pending.clear()
+            # 正在进行的下载完成后关闭seen.db，不阻塞调用方（界面线程）
+            threading.Thread(target=self.close_seen_db, args=(pool,), daemon=True).start()
             self.add_log('自动缓存任务停止', 'warning')
     
     def toggle_running(self):
@@ -223,36 +500,66 @@ class BilibiliCache:
         else:
             self.start_dynamic_monitor()
     
+    def fetch_all_dynamics(self, pool):
+        """
+        并发获取所有UP主最新动态中的视频BV号
+        
+        Args:
+            pool: 用于发起请求的线程池
+            
+        Returns:
+            list: (uid, bvids) 元组列表，顺序与配置中的bupid一致
+        """
+        uids = self.config['bupid']
+        self.get_session()  # 在分发到线程池之前创建会话，避免多个线程同时创建
+        for uid in uids:
+            self.add_log(f'检查UP主 {uid} 的动态...', 'info')
+        return list(zip(uids, pool.map(self.get_dynamic, uids)))
+    
     def monitor_dynamics(self):
         """监控UP主动态"""
+        # 一轮检查内所有UP主的请求同时发出，单轮耗时约等于最慢的一次请求
+        pool = ThreadPoolExecutor(max_workers=self.POLL_WORKERS, thread_name_prefix='poll')
         while self.running:
             try:
-                for uid in self.config['bupid']:
+                for uid, bvids in self.fetch_all_dynamics(pool):
                     if not self.running:
                         break
                     
-                    self.add_log(f'检查UP主 {uid} 的动态...', 'info')
-                    items = self.get_dynamic(uid)
-                    
-                    if items:
-                        # 处理最新动态
-                        for item in items[:3]:
-                            if not self.running:
-                                break
-                            
-                            if item['type'] == 'DYNAMIC_TYPE_AV':
-                                bvid = item['modules']['module_dynamic']['major']['archive']['bvid']
-                                self.download_video(bvid)
+                    # 处理最新的视频动态
+                    for bvid in bvids or ():
+                        if not self.running:
+                            break
+                        
+                        # 已缓存过或正在下载的视频跳过
+                        with self._seen_lock:
+                            if bvid in self._seen:
+                                self._seen.move_to_end(bvid)
+                                continue
+                            if bvid in self._pending:
+                                continue
+                            self._pending.add(bvid)
+                        try:
+                            self._dl_pool.submit(self.download_task, bvid)
+                        except RuntimeError:
+                            # 检查后监控已被停止、线程池已关闭：撤销标记，避免之后重新启动时跳过该视频
+                            with self._seen_lock:
+                                self._pending.discard(bvid)
+                            break
                 
-                # 等待间隔
-                time.sleep(self.config['interval-sec'])
+                # 等待间隔（收到停止信号时立即结束）
+                if self._stop_event.wait(timeout=self.config['interval-sec']):
+                    break
             except Exception as e:
                 self.add_log(f'监控出错: {str(e)}', 'error')
-                time.sleep(10)  # 出错后等待10秒再重试
+                if self._stop_event.wait(timeout=10):  # 出错后等待10秒再重试
+                    break
+        pool.shutdown(wait=False)
 
 # 启动Dynamic.py的辅助函数
 def start_dynamic_monitor():
     """启动动态监控程序"""
+    import subprocess
     try:
         # 确保同目录下有Dynamic.py
         if os.path.exists('Dynamic.py'):
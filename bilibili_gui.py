@@ -19,14 +19,57 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
+import base64
+import io
 import json
+import mmap
 import os
 import sys
 import threading
-import subprocess
+import time
 import webbrowser
-from datetime import datetime
+from collections import OrderedDict, deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import pyqrcode
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# PIL/Pillow为可选依赖，用于给二维码加白边并调整显示大小；没有安装时使用tkinter自带的PhotoImage显示
+try:
+    from PIL import Image, ImageTk, ImageOps
+    _HAS_PIL = True
+except ImportError:
+    Image = ImageTk = ImageOps = None
+    _HAS_PIL = False
+
+# 尝试使用orjson加速配置的解析，如果失败则使用标准库json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+
+def _dumps(obj):
+    """序列化配置；统一使用标准库json的4空格缩进，与Dynamic.setconfig写出的config.json格式一致"""
+    return json.dumps(obj, ensure_ascii=False, indent=4)
+
+# 调试开关：设置环境变量 BILI_DEBUG=1 时输出扫码登录的调试信息
+DEBUG = os.environ.get('BILI_DEBUG', '0') not in ('', '0')
+
+# 处理后的二维码图片（调试用）的保存位置
+_QRCODE_DEBUG_PATH = Path(__file__).parent / 'test_qrcode_with_border.png'
+
+# 扫码登录使用的请求超时：(连接超时, 读取超时)，避免网络卡住时轮询线程一直挂起
+_HTTP_TIMEOUT = (3.05, 10)
+
+# 模块级共享的HTTP会话：生成二维码和轮询状态复用同一个连接池，连接保持复用
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3)))
+_SESSION.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
 
 class BilibiliCacheGUI:
     """
@@ -38,6 +81,55 @@ class BilibiliCacheGUI:
     - 日志显示面板
     - 扫码登录功能
     """
+    # 日志控件最多保留的行数，超出后删除最早的行
+    MAX_LOG_LINES = 2000
+    # 刷新日志时只读取日志文件末尾的字节数
+    LOG_TAIL_BYTES = 256 * 1024
+    # 记录日志文件开头的字节数，用于发现文件被清空后又写到超过原位置的情况
+    LOG_HEAD_BYTES = 64
+    # 最多缓存的已生成二维码图片数量
+    QR_CACHE_SIZE = 4
+    
+    # 控制面板按钮：(文字, 回调方法名, 行, 列, 保存到的属性名, 初始状态)
+    _BUTTONS = (
+        ("启动监控", "start_dynamic", 1, 0, "start_btn", "normal"),
+        ("停止监控", "stop_dynamic", 1, 1, "stop_btn", "disabled"),
+        ("扫码登录", "manual_login", 2, 0, "login_btn", "normal"),
+        ("保存配置", "save_config", 3, 0, None, "normal"),
+        ("重置配置", "reset_config", 3, 1, None, "normal"),
+        ("打开数据目录", "open_data_dir", 4, 0, None, "normal"),
+        ("打开日志文件", "open_log_file", 4, 1, None, "normal"),
+        ("清空日志", "clear_log", 5, 0, None, "normal"),
+        ("设置数据目录", "set_data_dir", 5, 1, None, "normal"),
+    )
+    
+    # 基本配置中的开关：(文字, 变量属性名, 默认值, 行, 列)
+    _BASIC_CHECKS = (
+        ("自动下载视频", "autodownload_var", True, 3, 0),
+        ("首次运行时下载", "downatfirst_var", True, 3, 1),
+        ("记录日志", "islog_var", True, 4, 0),
+    )
+    
+    # 高级配置中的开关：(文字, 变量属性名, 默认值, 行)
+    _ADVANCED_CHECKS = (
+        ("合并后移动文件", "move_after_combine_var", False, 2),
+        ("启用自动评论", "enable_autocomment_var", True, 3),
+        ("使用PIL优化显示", "qrcode_use_pil_var", True, 10),
+        ("清理前备份日志", "backup_log_var", False, 15),
+    )
+    
+    # 高级配置中的数值项：(标签, 变量属性名, 默认值, 最小值, 最大值, 行)
+    _ADVANCED_NUMBERS = (
+        ("二维码缩放 (不用PIL时):", "qrcode_scale_var", 8, 1, 12, 7),
+        ("二维码边框 (像素):", "qrcode_border_var", 20, 0, 200, 8),
+        ("显示大小 (像素):", "qrcode_display_size_var", 180, 50, 1000, 9),
+        ("清理间隔 (天):", "log_clean_interval_var", 7, 1, 365, 13),
+        ("最大日志大小 (MB):", "max_log_size_var", 10, 1, 10240, 14),
+    )
+    
+    # 用PIL调整二维码大小时可选的缩放方式（auto：整数倍放大用nearest，否则用bilinear）
+    QR_RESAMPLE_MODES = ('auto', 'nearest', 'bilinear')
+    
     def __init__(self, root):
         """
         初始化GUI应用程序
@@ -70,10 +162,39 @@ class BilibiliCacheGUI:
         self.default_config_path = 'static/default_config.json'  # 默认配置文件路径
         
         # 全局状态变量
-        self.dynamic_process = None    # 动态监控进程对象
         self.dynamic_thread = None     # 动态监控线程对象
+        self._stop_event = None        # 动态监控的停止信号
         self.is_running = False        # 监控运行状态标志
         
+        # 扫码登录窗口只创建一次，关闭时隐藏，再次登录时复用其控件和二维码图片对象
+        self._login_window = None
+        self._login_status_var = None
+        self._qr_label = None
+        self._qr_photo = None          # 当前显示二维码的PhotoImage（tk或PIL），原地更新内容
+        self._login_cancel = None      # 本次登录的取消信号，隐藏窗口时置位以结束轮询
+        # 已生成的二维码图片：(方式, 链接, 参数...) -> PIL图片或PNG的base64数据，按最近使用淘汰
+        self._qr_cache = OrderedDict()
+        
+        # 待显示的日志缓冲（环形，最多保留5000条），由定时器批量写入日志控件
+        self._log_buf = deque(maxlen=5000)
+        self._log_lock = threading.Lock()
+        # 已显示到日志文件的哪个位置，上次刷新时文件的(修改时间, 大小)，以及当时文件开头的内容
+        self._log_tail_offset = 0
+        self._log_last_stat = None
+        self._log_head = b''
+        
+        # 已解析的配置文件：路径 -> (修改时间, 文件大小, 配置)，文件未变化时直接复用
+        self._config_cache = {}
+        
+        # 配置文件写入线程（单线程，保证多次保存按顺序写入），避免磁盘慢时卡住界面
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='config-io')
+        
+        # JSON编辑器的延迟渲染状态：待渲染的配置（及已序列化好的文本）、已渲染的文本、是否已安排渲染
+        self._json_pending = None
+        self._json_pending_text = None
+        self._json_rendered = None
+        self._json_render_scheduled = False
+        
         # 初始化用户界面和加载配置
         self.init_ui()
         self.load_config()
@@ -108,6 +229,9 @@ class BilibiliCacheGUI:
         self.create_config_panel(main_frame)     # 右侧配置面板
         self.create_log_panel(main_frame)        # 底部日志面板
         
+        # 启动日志刷新定时器
+        self.root.after(50, self.flush_log_buffer)
+        
     def create_control_panel(self, parent):
         """
         创建左侧控制面板
@@ -131,39 +255,12 @@ class BilibiliCacheGUI:
                                      font=('Microsoft YaHei', 10))
         self.status_label.grid(row=0, column=0, columnspan=2, pady=(0, 10))
         
-        # 监控控制按钮组
-        self.start_btn = ttk.Button(control_frame, text="启动监控", 
-                                   command=self.start_dynamic, width=15)
-        self.start_btn.grid(row=1, column=0, pady=5)
-        
-        self.stop_btn = ttk.Button(control_frame, text="停止监控", 
-                                  command=self.stop_dynamic, width=15, state='disabled')
-        self.stop_btn.grid(row=1, column=1, pady=5)
-        
-        # 账号登录按钮
-        self.login_btn = ttk.Button(control_frame, text="扫码登录", 
-                                   command=self.manual_login, width=15)
-        self.login_btn.grid(row=2, column=0, pady=5)
-        
-        # 配置管理按钮组
-        ttk.Button(control_frame, text="保存配置", 
-                  command=self.save_config, width=15).grid(row=3, column=0, pady=5)
-        ttk.Button(control_frame, text="重置配置", 
-                  command=self.reset_config, width=15).grid(row=3, column=1, pady=5)
-        
-        # 文件管理按钮组
-        ttk.Button(control_frame, text="打开数据目录", 
-                  command=self.open_data_dir, width=15).grid(row=4, column=0, pady=5)
-        ttk.Button(control_frame, text="打开日志文件", 
-                  command=self.open_log_file, width=15).grid(row=4, column=1, pady=5)
-        
-        # 日志管理按钮组
-        ttk.Button(control_frame, text="清空日志", 
-                  command=self.clear_log, width=15).grid(row=5, column=0, pady=5)
-        
-        # 目录设置按钮
-        ttk.Button(control_frame, text="设置数据目录", 
-                  command=self.set_data_dir, width=15).grid(row=5, column=1, pady=5)
+        # 功能按钮组（监控控制、登录、配置管理、文件管理、日志管理、目录设置）
+        for text, command, row, column, attr, state in self._BUTTONS:
+            btn = ttk.Button(control_frame, text=text, command=getattr(self, command), width=15, state=state)
+            btn.grid(row=row, column=column, pady=5)
+            if attr:
+                setattr(self, attr, btn)
 
         # 作者和说明
         info_text1 = "作者: 艾"
@@ -259,24 +356,48 @@ class BilibiliCacheGUI:
         ttk.Label(parent, text="UP主ID列表 (每行一个):").grid(row=0, column=0, sticky="w", pady=5)
         self.bupid_text = scrolledtext.ScrolledText(parent, height=5, width=40)
         self.bupid_text.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+        # UP主列表只在内容变化后重新解析
+        self._bupid_dirty = True
+        self._cached_bupids = []
+        self.bupid_text.bind('<<Modified>>', self.on_bupid_modified)
         
         # 检查间隔
         ttk.Label(parent, text="检查间隔 (秒):").grid(row=2, column=0, sticky="w", pady=5)
-        self.interval_var = tk.StringVar(value="120")
-        ttk.Entry(parent, textvariable=self.interval_var, width=10).grid(row=2, column=1, sticky="w", pady=5)
-        
-        # 自动下载
-        self.autodownload_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(parent, text="自动下载视频", variable=self.autodownload_var).grid(row=3, column=0, sticky="w", pady=5)
+        self.interval_var = tk.IntVar(value=120)
+        ttk.Spinbox(parent, textvariable=self.interval_var, from_=1, to=86400, increment=1, width=10).grid(row=2, column=1, sticky="w", pady=5)
         
-        # 首次下载
-        self.downatfirst_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(parent, text="首次运行时下载", variable=self.downatfirst_var).grid(row=3, column=1, sticky="w", pady=5)
+        # 自动下载、首次下载、记录日志
+        for text, attr, default, row, column in self._BASIC_CHECKS:
+            var = tk.BooleanVar(value=default)
+            setattr(self, attr, var)
+            ttk.Checkbutton(parent, text=text, variable=var).grid(row=row, column=column, sticky="w", pady=5)
         
-        # 记录日志
-        self.islog_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(parent, text="记录日志", variable=self.islog_var).grid(row=4, column=0, sticky="w", pady=5)
+    def on_bupid_modified(self, event=None):
+        """UP主列表内容变化时标记需要重新解析"""
+        self._bupid_dirty = True
+        self.bupid_text.edit_modified(False)  # 复位修改标志，下次修改时才会再次触发
+    
+    def get_bupids(self):
+        """
+        获取界面中的UP主ID列表
         
+        内容未变化时直接返回缓存；无法解析的行会被跳过并记录到日志
+        """
+        if not self._bupid_dirty:
+            return list(self._cached_bupids)
+        bupids = []
+        for line in self.bupid_text.get(1.0, tk.END).split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                bupids.append(int(line))
+            except ValueError:
+                self.add_log(f"忽略无效的UP主ID: {line}")
+        self._cached_bupids = bupids
+        self._bupid_dirty = False
+        return list(bupids)
+    
     def create_advanced_config(self, parent):
         """创建高级配置界面"""
         # 数据目录
@@ -291,43 +412,32 @@ class BilibiliCacheGUI:
         ttk.Entry(parent, textvariable=self.final_dir_var, width=40).grid(row=1, column=1, sticky="ew", pady=5)
         ttk.Button(parent, text="浏览", command=self.browse_final_dir).grid(row=1, column=2, padx=(5, 0), pady=5)
 
-        # 合并后移动
-        self.move_after_combine_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(parent, text="合并后移动文件", variable=self.move_after_combine_var).grid(row=2, column=0, sticky="w", pady=5)
-
-        # 自动评论开关
-        self.enable_autocomment_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(parent, text="启用自动评论", variable=self.enable_autocomment_var).grid(row=3, column=0, sticky="w", pady=5)
+        # 合并后移动、自动评论、PIL显示、备份日志等开关
+        for text, attr, default, row in self._ADVANCED_CHECKS:
+            var = tk.BooleanVar(value=default)
+            setattr(self, attr, var)
+            ttk.Checkbutton(parent, text=text, variable=var).grid(row=row, column=0, sticky="w", pady=5)
 
         # 自动评论内容
         ttk.Label(parent, text="自动评论内容:").grid(row=4, column=0, sticky="w", pady=5)
         self.autocomment_text = scrolledtext.ScrolledText(parent, height=3, width=40)
         self.autocomment_text.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(0, 10))
 
-        # 二维码配置
+        # 二维码配置、日志清理配置的分组标题
         ttk.Label(parent, text="二维码配置:", font=('Microsoft YaHei', 10, 'bold')).grid(row=6, column=0, columnspan=2, sticky="w", pady=(10, 5))
-        ttk.Label(parent, text="二维码缩放 (1-12):").grid(row=7, column=0, sticky="w", pady=5)
-        self.qrcode_scale_var = tk.StringVar(value="8")
-        ttk.Entry(parent, textvariable=self.qrcode_scale_var, width=10).grid(row=7, column=1, sticky="w", pady=5)
-        ttk.Label(parent, text="二维码边框 (像素):").grid(row=8, column=0, sticky="w", pady=5)
-        self.qrcode_border_var = tk.StringVar(value="20")
-        ttk.Entry(parent, textvariable=self.qrcode_border_var, width=10).grid(row=8, column=1, sticky="w", pady=5)
-        ttk.Label(parent, text="显示大小 (像素):").grid(row=9, column=0, sticky="w", pady=5)
-        self.qrcode_display_size_var = tk.StringVar(value="180")
-        ttk.Entry(parent, textvariable=self.qrcode_display_size_var, width=10).grid(row=9, column=1, sticky="w", pady=5)
-        self.qrcode_use_pil_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(parent, text="使用PIL优化显示", variable=self.qrcode_use_pil_var).grid(row=10, column=0, sticky="w", pady=5)
-
-        # 日志清理配置
-        ttk.Label(parent, text="日志清理配置:", font=('Microsoft YaHei', 10, 'bold')).grid(row=11, column=0, columnspan=2, sticky="w", pady=(10, 5))
-        ttk.Label(parent, text="清理间隔 (天):").grid(row=12, column=0, sticky="w", pady=5)
-        self.log_clean_interval_var = tk.StringVar(value="7")
-        ttk.Entry(parent, textvariable=self.log_clean_interval_var, width=10).grid(row=12, column=1, sticky="w", pady=5)
-        ttk.Label(parent, text="最大日志大小 (MB):").grid(row=13, column=0, sticky="w", pady=5)
-        self.max_log_size_var = tk.StringVar(value="10")
-        ttk.Entry(parent, textvariable=self.max_log_size_var, width=10).grid(row=13, column=1, sticky="w", pady=5)
-        self.backup_log_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(parent, text="清理前备份日志", variable=self.backup_log_var).grid(row=14, column=0, sticky="w", pady=5)
+        ttk.Label(parent, text="日志清理配置:", font=('Microsoft YaHei', 10, 'bold')).grid(row=12, column=0, columnspan=2, sticky="w", pady=(10, 5))
+        
+        # 二维码缩放方式
+        ttk.Label(parent, text="缩放方式:").grid(row=11, column=0, sticky="w", pady=5)
+        self.qrcode_resample_var = tk.StringVar(value='auto')
+        ttk.Combobox(parent, textvariable=self.qrcode_resample_var, values=self.QR_RESAMPLE_MODES, state='readonly', width=10).grid(row=11, column=1, sticky="w", pady=5)
+        
+        # 各数值项
+        for label, attr, default, low, high, row in self._ADVANCED_NUMBERS:
+            var = tk.IntVar(value=default)
+            setattr(self, attr, var)
+            ttk.Label(parent, text=label).grid(row=row, column=0, sticky="w", pady=5)
+            ttk.Spinbox(parent, textvariable=var, from_=low, to=high, increment=1, width=10).grid(row=row, column=1, sticky="w", pady=5)
 
     def create_log_panel(self, parent):
         """创建底部日志面板"""
@@ -350,21 +460,39 @@ class BilibiliCacheGUI:
         self.log_size_label.pack(side=tk.RIGHT)
         
         # 日志显示区域
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=80)
+        # 日志控件只读，且不记录撤销历史，避免每次插入都压入撤销栈
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=80, undo=False, autoseparators=False, maxundo=0, state='disabled')
         self.log_text.grid(row=1, column=0, sticky="nsew")
         
         # 初始加载日志
         self.refresh_log()
         
+    def read_config(self, path):
+        """
+        读取并解析配置文件
+        
+        文件的修改时间和大小与上次相同时直接返回上次的解析结果（调用方不应修改返回的字典）
+        """
+        st = os.stat(path)
+        cached = self._config_cache.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        with open(path, 'rb') as f:
+            config = _loads(f.read())
+        self._config_cache[path] = (st.st_mtime_ns, st.st_size, config)
+        return config
+    
+    def read_user_config(self):
+        """读取用户配置文件，不存在时读取默认配置文件"""
+        try:
+            return self.read_config(self.config_path)
+        except FileNotFoundError:
+            return self.read_config(self.default_config_path)
+    
     def load_config(self):
         """加载配置文件"""
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            else:
-                with open(self.default_config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+            config = self.read_user_config()
             
             # 更新界面显示
             self.update_ui_from_config(config)
@@ -372,14 +500,20 @@ class BilibiliCacheGUI:
         except Exception as e:
             messagebox.showerror("错误", f"加载配置文件失败: {str(e)}")
     
-    def update_ui_from_config(self, config):
-        """从配置更新界面"""
+    def update_ui_from_config(self, config, json_text=None):
+        """
+        从配置更新界面
+        
+        Args:
+            config: 配置字典
+            json_text: 已序列化好的配置文本，传入时JSON编辑器直接使用，不再重复序列化
+        """
         # 基本配置
         self.bupid_text.delete(1.0, tk.END)
         if 'bupid' in config:
             self.bupid_text.insert(1.0, '\n'.join(map(str, config['bupid'])))
         
-        self.interval_var.set(str(config.get('interval-sec', 120)))
+        self.interval_var.set(config.get('interval-sec', 120))
         self.autodownload_var.set(config.get('autodownload', True))
         self.downatfirst_var.set(config.get('down-atfirst', True))
         self.islog_var.set(config.get('is_log', True))
@@ -394,45 +528,149 @@ class BilibiliCacheGUI:
         self.autocomment_text.insert(1.0, config.get('autocomment', ''))
         
         # 二维码配置
-        self.qrcode_scale_var.set(str(config.get('qrcode_scale', 8)))
-        self.qrcode_border_var.set(str(config.get('qrcode_border_size', 20)))
-        self.qrcode_display_size_var.set(str(config.get('qrcode_display_size', 180)))
+        self.qrcode_scale_var.set(config.get('qrcode_scale', 8))
+        self.qrcode_border_var.set(config.get('qrcode_border_size', 20))
+        self.qrcode_display_size_var.set(config.get('qrcode_display_size', 180))
         self.qrcode_use_pil_var.set(config.get('qrcode_use_pil', True))
+        resample = config.get('qrcode_resample', 'auto')
+        self.qrcode_resample_var.set(resample if resample in self.QR_RESAMPLE_MODES else 'auto')
         
         # 日志清理配置
-        self.log_clean_interval_var.set(str(config.get('log_clean_interval_days', 7)))
-        self.max_log_size_var.set(str(config.get('max_log_size_mb', 10)))
+        self.log_clean_interval_var.set(config.get('log_clean_interval_days', 7))
+        self.max_log_size_var.set(config.get('max_log_size_mb', 10))
         self.backup_log_var.set(config.get('backup_log_before_clean', False))
         
-        # JSON编辑器
+        # JSON编辑器：空闲时再渲染，同一轮事件中的多次更新只渲染一次
+        self._json_pending = config
+        self._json_pending_text = json_text
+        if not self._json_render_scheduled:
+            self._json_render_scheduled = True
+            self.root.after_idle(self.render_config_json)
+    
+    def render_config_json(self):
+        """
+        把待渲染的配置写入JSON编辑器
+        
+        只有在内容与上次渲染的相同、且用户之后没有编辑过编辑器时才跳过，
+        重置/应用配置时不会留下用户未保存的修改
+        """
+        self._json_render_scheduled = False
+        config = self._json_pending
+        if config is None:
+            return
+        text = self._json_pending_text or _dumps(config)
+        if text == self._json_rendered and not self.config_text.edit_modified():
+            return
         self.config_text.delete(1.0, tk.END)
-        self.config_text.insert(1.0, json.dumps(config, ensure_ascii=False, indent=4))
+        self.config_text.insert(1.0, text)
+        self.config_text.edit_modified(False)  # 复位修改标志，之后用户编辑时会重新置位
+        self._json_rendered = text
+    
+    def apply_config(self, config, persist=True):
+        """
+        把配置应用到界面，并按需写入配置文件
+        
+        配置只序列化一次，同一份文本既用于写入文件也用于JSON编辑器；
+        文件写入在后台线程中进行，失败时在主线程提示
+        
+        Args:
+            config: 配置字典
+            persist: 是否写入配置文件
+        """
+        text = _dumps(config)
+        if persist:
+            future = self._io_executor.submit(self.write_config_file, self.config_path, text, config)
+            future.add_done_callback(lambda f: self.root.after(0, self.on_config_applied, f))
+        self.update_ui_from_config(config, json_text=text)
+    
+    def on_config_applied(self, future):
+        """apply_config写入完成后，仅在失败时提示（主线程）"""
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("错误", f"保存配置失败: {str(error)}")
     
     def save_config(self):
-        """保存配置"""
+        """
+        保存配置
+        
+        在主线程中读取界面并序列化，文件写入交给后台线程，完成后在主线程弹出提示
+        
+        Returns:
+            Future: 写入任务（需要确保写入完成的调用方可等待其结果），读取界面失败时返回None
+        """
         try:
             # 从界面获取配置
             config = self.get_config_from_ui()
-            
-            # 保存到文件
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=4)
-            
-            messagebox.showinfo("成功", "配置已保存")
-            
+            text = _dumps(config)
         except Exception as e:
             messagebox.showerror("错误", f"保存配置失败: {str(e)}")
+            return None
+        
+        # 保存到文件
+        future = self._io_executor.submit(self.write_config_file, self.config_path, text)
+        future.add_done_callback(lambda f: self.root.after(0, self.on_config_saved, f))
+        return future
+    
+    def on_config_saved(self, future):
+        """配置写入完成后的提示（主线程）"""
+        error = future.exception()
+        if error is None:
+            messagebox.showinfo("成功", "配置已保存")
+        else:
+            messagebox.showerror("错误", f"保存配置失败: {str(error)}")
+    
+    def write_config_file(self, path, text, config=None):
+        """
+        写入配置文件（先写临时文件再替换，写入中断时不会留下不完整的配置）
+        
+        传入config时直接把它记入读取缓存，之后读取该文件不必重新解析
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if config is None:
+            self._config_cache.pop(path, None)
+        else:
+            st = os.stat(path)
+            self._config_cache[path] = (st.st_mtime_ns, st.st_size, config)
+    
+    def atomic_write_json(self, path, obj):
+        """把配置字典原子地写入文件"""
+        self.write_config_file(path, _dumps(obj), obj)
+    
+    def persist_config(self, config):
+        """在配置写入线程中保存配置（不阻塞调用线程），失败时记录日志"""
+        future = self._io_executor.submit(self.atomic_write_json, self.config_path, config)
+        future.add_done_callback(self.on_config_persisted)
+        return future
+    
+    def on_config_persisted(self, future):
+        """persist_config写入完成后的回调（在写入线程中执行），仅在失败时记录日志"""
+        error = future.exception()
+        if error is not None:
+            self.add_log(f"保存登录信息失败: {error}")
+    
+    def get_int(self, var, default):
+        """读取整数输入框的值，内容无效时恢复为默认值并记录日志，不影响其他配置的保存"""
+        try:
+            return var.get()
+        except tk.TclError:
+            self.add_log(f"无效的数值输入，已使用默认值 {default}")
+            var.set(default)
+            return default
     
     def get_config_from_ui(self, preserve_auth=True):
         """从界面获取配置"""
         config = {}
         
         # 基本配置
-        bupid_text = self.bupid_text.get(1.0, tk.END).strip()
-        config['bupid'] = [int(x.strip()) for x in bupid_text.split('\n') if x.strip()]
+        config['bupid'] = self.get_bupids()
         
-        config['interval-sec'] = int(self.interval_var.get())
+        config['interval-sec'] = self.get_int(self.interval_var, 120)
         config['autodownload'] = self.autodownload_var.get()
         config['down-atfirst'] = self.downatfirst_var.get()
         config['is_log'] = self.islog_var.get()
@@ -445,25 +683,24 @@ class BilibiliCacheGUI:
         config['autocomment'] = self.autocomment_text.get(1.0, tk.END).strip()
         
         # 二维码配置
-        config['qrcode_scale'] = int(self.qrcode_scale_var.get())
-        config['qrcode_border_size'] = int(self.qrcode_border_var.get())
-        config['qrcode_display_size'] = int(self.qrcode_display_size_var.get())
+        config['qrcode_scale'] = self.get_int(self.qrcode_scale_var, 8)
+        config['qrcode_border_size'] = self.get_int(self.qrcode_border_var, 20)
+        config['qrcode_display_size'] = self.get_int(self.qrcode_display_size_var, 180)
         config['qrcode_use_pil'] = self.qrcode_use_pil_var.get()
+        config['qrcode_resample'] = self.qrcode_resample_var.get()
         
         # 日志清理配置
-        config['log_clean_interval_days'] = int(self.log_clean_interval_var.get())
-        config['max_log_size_mb'] = int(self.max_log_size_var.get())
+        config['log_clean_interval_days'] = self.get_int(self.log_clean_interval_var, 7)
+        config['max_log_size_mb'] = self.get_int(self.max_log_size_var, 10)
         config['backup_log_before_clean'] = self.backup_log_var.get()
         
         # 根据参数决定是否保留认证信息
         if preserve_auth:
             try:
-                if os.path.exists(self.config_path):
-                    with open(self.config_path, 'r', encoding='utf-8') as f:
-                        old_config = json.load(f)
-                        for key in ['headers', 'Cookies', 'refresh_token']:
-                            if key in old_config:
-                                config[key] = old_config[key]
+                old_config = self.read_config(self.config_path)
+                for key in ['headers', 'Cookies', 'refresh_token']:
+                    if key in old_config:
+                        config[key] = old_config[key]
             except (FileNotFoundError, json.JSONDecodeError, KeyError):
                 pass
         
@@ -482,43 +719,36 @@ class BilibiliCacheGUI:
             return
         
         try:
-            if os.path.exists(self.default_config_path):
-                with open(self.default_config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                
-                if result:  # 完全重置
-                    # 清除认证信息
-                    if 'Cookies' in config:
-                        config['Cookies']['SESSDATA'] = ""
-                    if 'refresh_token' in config:
-                        config['refresh_token'] = ""
-                    # 完全重置时关闭日志功能
-                    config['is_log'] = False
-                    messagebox.showinfo("成功", "配置已完全重置（登录信息已清除，日志功能已关闭）")
-                else:  # 保留登录信息重置
-                    # 保留原有的认证信息
-                    try:
-                        if os.path.exists(self.config_path):
-                            with open(self.config_path, 'r', encoding='utf-8') as f:
-                                old_config = json.load(f)
-                                for key in ['headers', 'Cookies', 'refresh_token']:
-                                    if key in old_config:
-                                        config[key] = old_config[key]
-                    except (FileNotFoundError, json.JSONDecodeError, KeyError):
-                        pass
-                    messagebox.showinfo("成功", "配置已重置（登录信息已保留）")
-                
-                self.update_ui_from_config(config)
-                
-                # 立即保存重置后的配置
-                try:
-                    os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-                    with open(self.config_path, 'w', encoding='utf-8') as f:
-                        json.dump(config, f, ensure_ascii=False, indent=4)
-                except Exception as e:
-                    messagebox.showerror("错误", f"保存重置配置失败: {str(e)}")
-            else:
+            try:
+                with open(self.default_config_path, 'rb') as f:
+                    config = _loads(f.read())
+            except FileNotFoundError:
                 messagebox.showerror("错误", "默认配置文件不存在")
+                return
+            
+            if result:  # 完全重置
+                # 清除认证信息
+                if 'Cookies' in config:
+                    config['Cookies']['SESSDATA'] = ""
+                if 'refresh_token' in config:
+                    config['refresh_token'] = ""
+                # 完全重置时关闭日志功能
+                config['is_log'] = False
+                messagebox.showinfo("成功", "配置已完全重置（登录信息已清除，日志功能已关闭）")
+            else:  # 保留登录信息重置
+                # 保留原有的认证信息
+                try:
+                    with open(self.config_path, 'rb') as f:
+                        old_config = _loads(f.read())
+                    for key in ['headers', 'Cookies', 'refresh_token']:
+                        if key in old_config:
+                            config[key] = old_config[key]
+                except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                    pass
+                messagebox.showinfo("成功", "配置已重置（登录信息已保留）")
+            
+            # 更新界面并立即保存重置后的配置（只序列化一次）
+            self.apply_config(config)
         except Exception as e:
             messagebox.showerror("错误", f"重置配置失败: {str(e)}")
     
@@ -526,16 +756,14 @@ class BilibiliCacheGUI:
         """启动动态监控"""
         if self.is_running:
             return
+        if self.dynamic_thread is not None and self.dynamic_thread.is_alive():
+            messagebox.showinfo("提示", "上一次的监控正在结束（可能在等待当前下载完成），请稍后再启动")
+            return
 
         # 启动前检查登录状态
         try:
             # 读取配置文件
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            else:
-                with open(self.default_config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+            config = self.read_user_config()
             sessdata = config.get('Cookies', {}).get('SESSDATA', '')
             refresh_token = config.get('refresh_token', '')
             if not sessdata or not refresh_token:
@@ -546,19 +774,34 @@ class BilibiliCacheGUI:
             messagebox.showerror("错误", f"读取配置文件失败: {e}")
             return
 
+        # 保存当前配置，写入完成后再启动（Dynamic.py启动时会读取配置文件）；不在主线程中等待写入
+        future = self.save_config()
+        if future is None:
+            return
+        self.start_btn.config(state='disabled')  # 写入期间防止重复启动
+        future.add_done_callback(lambda f: self.root.after(0, self.launch_dynamic, f))
+    
+    def launch_dynamic(self, future):
+        """配置写入完成后启动监控线程（主线程）；写入失败时on_config_saved已提示过，这里只恢复按钮"""
+        if future.exception() is not None:
+            self.start_btn.config(state='normal')
+            return
+        if self.is_running:
+            return
         try:
-            # 保存当前配置
-            self.save_config()
-            # 启动监控线程
-            self.dynamic_thread = threading.Thread(target=self.run_dynamic)
+            # 在后台线程中直接运行动态监控
+            self.is_running = True
+            self._stop_event = threading.Event()
+            self.dynamic_thread = threading.Thread(target=self.run_dynamic, args=(self._stop_event,))
             self.dynamic_thread.daemon = True
             self.dynamic_thread.start()
-            self.is_running = True
             self.status_label.config(text="状态: 运行中")
             self.start_btn.config(state='disabled')
             self.stop_btn.config(state='normal')
             self.add_log("监控已启动")
         except Exception as e:
+            self.is_running = False
+            self.start_btn.config(state='normal')
             messagebox.showerror("错误", f"启动失败: {str(e)}")
     
     def stop_dynamic(self):
@@ -566,75 +809,131 @@ class BilibiliCacheGUI:
         if not self.is_running:
             return
         
-        try:
-            if self.dynamic_process:
-                if sys.platform == 'win32':
-                    subprocess.call(['taskkill', '/F', '/T', '/PID', str(self.dynamic_process.pid)])
-                else:
-                    os.kill(self.dynamic_process.pid, 9)
-                self.dynamic_process = None
-            
-            self.is_running = False
-            self.status_label.config(text="状态: 已停止")
-            self.start_btn.config(state='normal')
-            self.stop_btn.config(state='disabled')
-            
-            self.add_log("监控已停止")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"停止失败: {str(e)}")
+        # 通知监控循环退出（正在进行的等待会立即结束），不强行终止线程，让当前下载正常收尾
+        self._stop_event.set()
+        self.stop_btn.config(state='disabled')
+        self.status_label.config(text="状态: 正在停止...")
+        self.add_log("正在停止监控...")
+        self.wait_dynamic_stopped()
     
-    def run_dynamic(self):
-        """运行Dynamic.py"""
+    def wait_dynamic_stopped(self):
+        """每200毫秒检查一次监控线程是否已退出，退出后恢复界面状态（主线程，不阻塞界面）"""
+        if self.dynamic_thread is not None and self.dynamic_thread.is_alive():
+            self.root.after(200, self.wait_dynamic_stopped)
+            return
+        self.on_dynamic_stopped()
+        self.add_log("监控已停止")
+    
+    def on_dynamic_stopped(self):
+        """恢复为未运行状态（主线程）"""
+        self.is_running = False
+        self.status_label.config(text="状态: 已停止")
+        self.start_btn.config(state='normal')
+        self.stop_btn.config(state='disabled')
+    
+    def run_dynamic(self, stop_event):
+        """
+        运行动态监控（后台线程）
+        
+        直接在本进程中运行Dynamic，日志通过add_log进入日志缓冲；
+        监控因错误或登录失效自行结束时，在主线程中恢复界面状态
+        """
         try:
-            self.dynamic_process = subprocess.Popen(
-                [sys.executable, 'Dynamic.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='ignore'
-            )
-            
-            while self.dynamic_process and self.dynamic_process.poll() is None:
-                if self.dynamic_process.stdout is not None:
-                    line = self.dynamic_process.stdout.readline()
-                    if line is not None:
-                        self.add_log(line.strip())
-            
+            import Dynamic
+            Dynamic.run(stop_event, self.add_log)
         except Exception as e:
             self.add_log(f"运行错误: {str(e)}")
+        if not stop_event.is_set():
+            self.add_log("监控已结束")
+            self.root.after(0, self.on_dynamic_stopped)
     
     def add_log(self, message):
-        """添加日志"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = f"[{timestamp}] {message}\n"
-        
-        # 在主线程中更新UI
-        self.root.after(0, lambda: self.log_text.insert(tk.END, log_entry))
-        self.root.after(0, lambda: self.log_text.see(tk.END))
+        """添加日志（可在任意线程调用，只放入缓冲区，由flush_log_buffer统一加时间戳并显示）"""
+        with self._log_lock:
+            self._log_buf.append(message)
+    
+    def flush_log_buffer(self):
+        """在主线程中把缓冲区的日志一次性写入日志控件，每50毫秒执行一次；同一批日志共用一个时间戳"""
+        with self._log_lock:
+            messages = list(self._log_buf)
+            self._log_buf.clear()
+        if messages:
+            prefix = time.strftime('[%H:%M:%S] ')
+            self.write_log_text("".join(f"{prefix}{message}\n" for message in messages))
+        self.root.after(50, self.flush_log_buffer)
+    
+    def write_log_text(self, content, replace=False):
+        """向只读的日志控件写入一整批文本；replace为True时先清空原有内容"""
+        w = self.log_text
+        w.configure(state='normal')
+        if replace:
+            w.delete(1.0, tk.END)
+        if content:
+            w.insert(tk.END, content)
+            self.trim_log_text()
+        w.configure(state='disabled')
+        w.see(tk.END)
+    
+    def trim_log_text(self):
+        """日志控件超过MAX_LOG_LINES行时删除最早的行，避免控件无限增长"""
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        excess = line_count - self.MAX_LOG_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
     
     def refresh_log(self):
-        """刷新日志显示"""
+        """
+        刷新日志显示
+        
+        日志文件未变化时不读取；文件只是变长时只追加新增的完整行；
+        首次刷新或文件被清空/截断时（变短，或开头内容与上次不同）重新读取文件末尾部分
+        """
         try:
-            if os.path.exists('log.txt'):
-                with open('log.txt', 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.log_text.delete(1.0, tk.END)
-                self.log_text.insert(1.0, content)
-                self.log_text.see(tk.END)
-                
-                # 更新日志文件大小显示
-                file_size = os.path.getsize('log.txt')
-                if file_size < 1024:
-                    size_text = f"日志大小: {file_size} B"
-                elif file_size < 1024 * 1024:
-                    size_text = f"日志大小: {file_size / 1024:.1f} KB"
+            try:
+                st = os.stat('log.txt')
+            except FileNotFoundError:
+                self.log_size_label.config(text="日志大小: 文件不存在")
+                return
+            file_size = st.st_size
+            if (st.st_mtime_ns, file_size) == self._log_last_stat:
+                return
+            
+            append = 0 < self._log_tail_offset <= file_size
+            with open('log.txt', 'rb') as f:
+                # 清空后又写到超过原位置时大小判断不出截断，再比较文件开头确认仍是同一份日志
+                head = f.read(self.LOG_HEAD_BYTES)
+                if append and not head.startswith(self._log_head):
+                    append = False
+                self._log_head = head
+                if append:
+                    start = self._log_tail_offset
                 else:
-                    size_text = f"日志大小: {file_size / (1024 * 1024):.1f} MB"
-                self.log_size_label.config(text=size_text)
+                    # 只读取文件末尾部分，日志文件很大时也不会整体读入
+                    start = max(0, file_size - self.LOG_TAIL_BYTES)
+                # 通过内存映射只取所需的末尾部分（空文件无法映射）
+                data = b''
+                if file_size > start:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        data = mm[start:file_size]
+            # 末尾可能是正在写入的半行，留到下次再读
+            end = data.rfind(b'\n') + 1
+            self._log_tail_offset = start + end
+            data = data[:end]
+            if start > 0 and not append:
+                # 丢弃被截断的第一行
+                data = data[data.find(b'\n') + 1:]
+            content = data.decode('utf-8', errors='replace')
+            self.write_log_text(content, replace=not append)
+            self._log_last_stat = (st.st_mtime_ns, file_size)
+            
+            # 更新日志文件大小显示
+            if file_size < 1024:
+                size_text = f"日志大小: {file_size} B"
+            elif file_size < 1024 * 1024:
+                size_text = f"日志大小: {file_size / 1024:.1f} KB"
             else:
-                self.log_size_label.config(text="日志大小: 文件不存在")
+                size_text = f"日志大小: {file_size / (1024 * 1024):.1f} MB"
+            self.log_size_label.config(text=size_text)
         except Exception as e:
             self.add_log(f"读取日志失败: {str(e)}")
     
@@ -644,25 +943,30 @@ class BilibiliCacheGUI:
             try:
                 with open('log.txt', 'w', encoding='utf-8') as f:
                     f.write('')
-                self.log_text.delete(1.0, tk.END)
+                self._log_tail_offset = 0
+                self._log_last_stat = None
+                self._log_head = b''
+                self.write_log_text('', replace=True)
                 self.add_log("日志已清空")
             except Exception as e:
                 messagebox.showerror("错误", f"清空日志失败: {str(e)}")
     
     def open_data_dir(self):
         """打开数据目录"""
-        config = self.get_config_from_ui()
-        data_dir = config.get('datadir', '')
-        if data_dir and os.path.exists(data_dir):
+        data_dir = self.datadir_var.get().strip()
+        if not data_dir:
+            messagebox.showinfo("提示", "数据目录未设置或不存在")
+            return
+        try:
             os.startfile(data_dir)
-        else:
+        except FileNotFoundError:
             messagebox.showinfo("提示", "数据目录未设置或不存在")
     
     def open_log_file(self):
         """打开日志文件"""
-        if os.path.exists('log.txt'):
+        try:
             os.startfile('log.txt')
-        else:
+        except FileNotFoundError:
             messagebox.showinfo("提示", "日志文件不存在")
     
     def set_data_dir(self):
@@ -683,6 +987,121 @@ class BilibiliCacheGUI:
         if directory:
             self.final_dir_var.set(directory)
 
+    def create_login_window(self):
+        """创建扫码登录窗口及其控件（只在首次登录时调用），返回(窗口, 状态变量, 二维码标签)"""
+        login_window = tk.Toplevel(self.root)
+        login_window.title("B站扫码登录")
+        login_window.geometry("320x420")  # 设置窗口大小
+        login_window.resizable(False, False)  # 禁止调整大小
+        login_window.transient(self.root)  # 设置为主窗口的临时窗口
+        login_window.grab_set()  # 模态窗口，阻止其他窗口操作
+        
+        # 窗口居中显示
+        login_window.update_idletasks()
+        x = (login_window.winfo_screenwidth() // 2) - (320 // 2)
+        y = (login_window.winfo_screenheight() // 2) - (420 // 2)
+        login_window.geometry(f"320x420+{x}+{y}")
+
+        # 创建标题标签
+        title_label = tk.Label(login_window, text="请使用B站App扫码登录", font=("Microsoft YaHei", 14, "bold"))
+        title_label.pack(pady=(20, 10))
+
+        # 创建状态显示标签
+        status_var = tk.StringVar(value="正在生成二维码...")
+        status_label = tk.Label(login_window, textvariable=status_var, font=("Microsoft YaHei", 10), fg="blue")
+        status_label.pack(pady=(0, 10))
+
+        # 创建二维码显示区域
+        qr_frame = tk.Frame(login_window, width=200, height=200)
+        qr_frame.pack(pady=(0, 20))
+        qr_frame.pack_propagate(False)  # 固定框架大小
+        qr_label = tk.Label(qr_frame, bg="white")
+        qr_label.pack(expand=True, fill="both")
+
+        # 按钮区域
+        button_frame = tk.Frame(login_window)
+        button_frame.pack(pady=(0, 20))
+        cancel_btn = tk.Button(button_frame, text="取消", command=self.hide_login_window, width=15)
+        cancel_btn.pack()
+
+        # 关闭窗口时只隐藏，下次登录直接复用
+        login_window.protocol("WM_DELETE_WINDOW", self.hide_login_window)
+        
+        self._login_window = login_window
+        self._login_status_var = status_var
+        self._qr_label = qr_label
+        return login_window, status_var, qr_label
+    
+    def hide_login_window(self):
+        """隐藏登录窗口：结束本次轮询、释放模态并清理二维码临时文件"""
+        if self._login_cancel is not None:
+            self._login_cancel.set()
+        if self._login_window is not None and self._login_window.winfo_exists():
+            self._login_window.grab_release()
+            self._login_window.withdraw()
+        self.cleanup_qrcode_files()
+    
+    def get_cached_qrcode(self, key, factory, *args):
+        """从二维码缓存中取出key对应的图片，未命中时调用factory(*args)生成并放入缓存"""
+        cache = self._qr_cache
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+        value = cache[key] = factory(*args)
+        if len(cache) > self.QR_CACHE_SIZE:
+            cache.popitem(last=False)
+        return value
+    
+    def make_qrcode_image(self, qrcode_url, border_size, display_size, resample='auto'):
+        """
+        用PIL生成带白边、接近显示大小的二维码图片
+        
+        缩放倍数由显示大小和边框算出，不使用qrcode_scale配置（该配置只用于不经PIL的显示方式）。
+        resample为调整大小时的缩放方式：二维码只有黑白两色，不使用LANCZOS等面向照片的滤镜；
+        auto时整数倍放大用NEAREST（像素精确），缩小或非整数倍时用BILINEAR
+        （NEAREST会整行整列地丢弃或重复模块，可能导致二维码无法识别）
+        """
+        qr = pyqrcode.create(qrcode_url)
+        # 按显示大小直接算出整数缩放倍数生成二维码，避免再整体重采样
+        modules = qr.get_png_size(scale=1)
+        scale = max(1, (display_size - 2 * border_size) // modules)
+        qrcode_buf = io.BytesIO()
+        qr.png(qrcode_buf, scale=scale)
+        qrcode_buf.seek(0)
+        img = Image.open(qrcode_buf)
+        # 添加白边
+        if border_size > 0:
+            img = ImageOps.expand(img, border=border_size, fill='white')
+        # 整数倍数凑不齐显示大小时才调整
+        native_size = img.size[0]
+        if abs(native_size - display_size) > 1:
+            if resample == 'auto':
+                resample = 'nearest' if display_size % native_size == 0 else 'bilinear'
+            method = Image.Resampling.NEAREST if resample == 'nearest' else Image.Resampling.BILINEAR
+            if method != Image.Resampling.NEAREST and img.mode in ('1', 'P'):
+                img = img.convert('L')  # PIL对1位/调色板图片只能按NEAREST缩放，转为灰度后BILINEAR才生效
+            img = img.resize((display_size, display_size), method)
+        return img
+    
+    def make_qrcode_data(self, qrcode_url, scale):
+        """在内存中生成二维码PNG（使用配置的scale值），返回PhotoImage可直接使用的base64数据"""
+        qrcode_buf = io.BytesIO()
+        pyqrcode.create(qrcode_url).png(qrcode_buf, scale=scale)
+        return base64.b64encode(qrcode_buf.getvalue())
+    
+    def cleanup_qrcode_files(self):
+        """
+        清理二维码相关的临时文件
+        
+        原始二维码在内存中生成，只需删除：
+        - test_qrcode_with_border.png: 处理后的二维码图片（调试用）
+        """
+        try:
+            _QRCODE_DEBUG_PATH.unlink(missing_ok=True)
+        except OSError:
+            pass  # 文件被占用等情况下保留，下次再清理
+
     def manual_login(self):
         """
         手动扫码登录功能
@@ -700,79 +1119,30 @@ class BilibiliCacheGUI:
         4. 保存登录信息到配置文件
         """
         try:
-            # 创建独立的登录窗口
-            login_window = tk.Toplevel(self.root)
-            login_window.title("B站扫码登录")
-            login_window.geometry("320x420")  # 设置窗口大小
-            login_window.resizable(False, False)  # 禁止调整大小
-            login_window.transient(self.root)  # 设置为主窗口的临时窗口
-            login_window.grab_set()  # 模态窗口，阻止其他窗口操作
+            login_window = self._login_window
+            if login_window is not None and login_window.winfo_exists():
+                # 复用已创建的登录窗口
+                login_window.deiconify()
+                login_window.grab_set()
+                status_var = self._login_status_var
+                qr_label = self._qr_label
+                status_var.set("正在生成二维码...")
+            else:
+                login_window, status_var, qr_label = self.create_login_window()
             
-            # 窗口居中显示
-            login_window.update_idletasks()
-            x = (login_window.winfo_screenwidth() // 2) - (320 // 2)
-            y = (login_window.winfo_screenheight() // 2) - (420 // 2)
-            login_window.geometry(f"320x420+{x}+{y}")
-
-            # 创建标题标签
-            title_label = tk.Label(login_window, text="请使用B站App扫码登录", font=("Microsoft YaHei", 14, "bold"))
-            title_label.pack(pady=(20, 10))
-
-            # 创建状态显示标签
-            status_var = tk.StringVar(value="正在生成二维码...")
-            status_label = tk.Label(login_window, textvariable=status_var, font=("Microsoft YaHei", 10), fg="blue")
-            status_label.pack(pady=(0, 10))
-
-            # 创建二维码显示区域
-            qr_frame = tk.Frame(login_window, width=200, height=200)
-            qr_frame.pack(pady=(0, 20))
-            qr_frame.pack_propagate(False)  # 固定框架大小
-            qr_label = tk.Label(qr_frame, bg="white")
-            qr_label.pack(expand=True, fill="both")
-
-            # 定义清理临时文件的函数
-            def cleanup_qrcode_files():
-                """
-                清理二维码相关的临时文件
-                
-                删除以下文件：
-                - temp_qrcode.png: 原始二维码图片
-                - test_qrcode_with_border.png: 处理后的二维码图片
-                """
-                try:
-                    qrcode_path = os.path.join(os.path.dirname(__file__), 'temp_qrcode.png')
-                    if os.path.exists(qrcode_path):
-                        os.remove(qrcode_path)
-                except:
-                    pass
-                try:
-                    processed_path = os.path.join(os.path.dirname(__file__), 'test_qrcode_with_border.png')
-                    if os.path.exists(processed_path):
-                        os.remove(processed_path)
-                except:
-                    pass
-
-            # 按钮区域
-            button_frame = tk.Frame(login_window)
-            button_frame.pack(pady=(0, 20))
-            cancel_btn = tk.Button(button_frame, text="取消", command=lambda: [cleanup_qrcode_files(), login_window.destroy()], width=15)
-            cancel_btn.pack()
+            # 本次登录的取消信号，旧的轮询线程会随旧信号结束
+            cancel = threading.Event()
+            self._login_cancel = cancel
 
             def perform_login():
                 try:
-                    import requests
-                    import pyqrcode
-                    import os
-                    import time
-                    import json
-                    sess = requests.Session()
-                    sess.headers.update({
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
-                    })
+                    sess = _SESSION
+                    sess.cookies.clear()  # 每次登录从空的Cookie开始
                     status_var.set("正在获取二维码...")
                     login_window.update()
-                    rep = sess.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate')
-                    print("二维码接口返回：", rep.text)
+                    rep = sess.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate', timeout=_HTTP_TIMEOUT)
+                    if DEBUG:
+                        print("二维码接口返回：", rep.text)
                     if rep.text.strip() == "":
                         status_var.set("网络请求失败，未获取到二维码数据！\n请检查网络或代理设置。")
                         return
@@ -787,66 +1157,62 @@ class BilibiliCacheGUI:
                     qrcode_url = rep_json['data']['url']
                     token = rep_json['data']['qrcode_key']
                     
-                    # 获取二维码配置参数
+                    # 获取界面配置快照：读取二维码参数，登录成功后也在它上面写入登录信息并保存
                     config = self.get_config_from_ui()
                     qrcode_scale = config.get('qrcode_scale', 8)
                     qrcode_border_size = config.get('qrcode_border_size', 20)
                     qrcode_display_size = config.get('qrcode_display_size', 180)
                     qrcode_use_pil = config.get('qrcode_use_pil', True)
-                    
-                    # 生成二维码图片（使用配置的scale值）
-                    qrcode_path = os.path.join(os.path.dirname(__file__), 'temp_qrcode.png')
-                    pyqrcode.create(qrcode_url).png(qrcode_path, scale=qrcode_scale)
+                    qrcode_resample = config.get('qrcode_resample', 'auto')
                     
                     # 显示二维码（根据配置选择处理方式）
                     qr_displayed = False
                     
-                    # 方法1: 如果配置启用PIL，尝试使用PIL处理图片
-                    if qrcode_use_pil and not qr_displayed:
+                    # 方法1: 如果已安装PIL且配置启用，使用PIL处理图片
+                    if _HAS_PIL and qrcode_use_pil and not qr_displayed:
                         try:
-                            # 尝试多种PIL导入方式
-                            try:
-                                from PIL import Image, ImageTk, ImageOps
-                            except ImportError:
-                                try:
-                                    import PIL
-                                    from PIL import Image, ImageTk, ImageOps
-                                except ImportError:
-                                    raise ImportError("PIL/Pillow not available")
-                            
-                            img = Image.open(qrcode_path)
-                            # 添加白边并调整大小
-                            img = ImageOps.expand(img, border=qrcode_border_size, fill='white')
-                            # 使用高质量重采样方法调整图片大小
-                            img = img.resize((qrcode_display_size, qrcode_display_size), Image.Resampling.LANCZOS)
+                            # 同一链接和参数的二维码只生成一次
+                            img = self.get_cached_qrcode(('pil', qrcode_url, qrcode_border_size, qrcode_display_size, qrcode_resample),
+                                                         self.make_qrcode_image, qrcode_url, qrcode_border_size, qrcode_display_size, qrcode_resample)
                             
-                            # 转换为PhotoImage
-                            photo = ImageTk.PhotoImage(img)
+                            # 复用尺寸相同的PhotoImage，只替换内容，避免每次登录新建图片对象
+                            photo = self._qr_photo
+                            if isinstance(photo, ImageTk.PhotoImage) and (photo.width(), photo.height()) == img.size:
+                                photo.paste(img)
+                            else:
+                                photo = self._qr_photo = ImageTk.PhotoImage(img)  # 保持引用
                             qr_label.config(image=photo)
-                            perform_login.photo = photo  # 保持引用
                             
-                            # 保存处理后的二维码用于调试
-                            processed_path = os.path.join(os.path.dirname(__file__), 'test_qrcode_with_border.png')
-                            img.save(processed_path)
+                            # 调试模式下保存处理后的二维码，PNG编码放到后台线程，不阻塞界面
+                            if DEBUG:
+                                threading.Thread(target=img.save, args=(_QRCODE_DEBUG_PATH,), daemon=True).start()
                             
-                            print("✅ 使用PIL处理二维码成功")
+                            if DEBUG:
+                                print("✅ 使用PIL处理二维码成功")
                             qr_displayed = True
                             
                         except Exception as pil_error:
-                            print(f"PIL处理失败: {pil_error}")
+                            if DEBUG:
+                                print(f"PIL处理失败: {pil_error}")
                             # 如果PIL失败，继续尝试默认方式
                     
                     # 方法2: 使用默认的tkinter方式
                     if not qr_displayed:
                         try:
-                            from tkinter import PhotoImage
-                            photo = PhotoImage(file=qrcode_path)
+                            qrcode_data = self.get_cached_qrcode(('tk', qrcode_url, qrcode_scale),
+                                                                 self.make_qrcode_data, qrcode_url, qrcode_scale)
+                            photo = self._qr_photo
+                            if isinstance(photo, tk.PhotoImage):
+                                photo.configure(data=qrcode_data)
+                            else:
+                                photo = self._qr_photo = tk.PhotoImage(data=qrcode_data)  # 保持引用
                             qr_label.config(image=photo)
-                            perform_login.photo = photo  # 保持引用
-                            print("✅ 使用默认方式显示二维码成功")
+                            if DEBUG:
+                                print("✅ 使用默认方式显示二维码成功")
                             qr_displayed = True
                         except Exception as tk_error:
-                            print(f"默认方式也失败: {tk_error}")
+                            if DEBUG:
+                                print(f"默认方式也失败: {tk_error}")
                     
                     # 如果所有方法都失败
                     if not qr_displayed:
@@ -855,51 +1221,73 @@ class BilibiliCacheGUI:
                     
                     status_var.set("请使用B站App扫码")
                     
+                    def set_status(text):
+                        # Tk不是线程安全的：轮询线程中的界面更新交给主线程执行
+                        login_window.after(0, status_var.set, text)
+                    
                     def poll_qrcode():
-                        while True:
-                            try:
-                                if not login_window.winfo_exists():
-                                    break
-                                rst = sess.get(f'https://passport.bilibili.com/x/passport-login/web/qrcode/poll?qrcode_key={token}')
-                                j = rst.json()
-                                code = j['data']['code']
-                                if code == 0:
-                                    status_var.set("扫码成功，正在登录...")
-                                    login_window.update()
-                                    config = self.get_config_from_ui()
-                                    config['refresh_token'] = j['data']['refresh_token']
-                                    cookies = {}
-                                    for co in rst.cookies:
-                                        cookies[co.name] = co.value
-                                    config['Cookies'] = cookies
-                                    os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-                                    with open(self.config_path, 'w', encoding='utf-8') as f:
-                                        json.dump(config, f, ensure_ascii=False, indent=4)
-                                    # 清理二维码临时文件
-                                    cleanup_qrcode_files()
-                                    status_var.set("登录成功！")
-                                    self.add_log("扫码登录成功")
-                                    login_window.after(2000, login_window.destroy)
-                                    break
-                                elif code == 86038:
-                                    status_var.set("二维码已失效，请重新获取")
-                                    # 清理二维码临时文件
-                                    cleanup_qrcode_files()
-                                    break
-                                elif code == 86090:
-                                    status_var.set("等待扫码...")
-                                elif code == 86101:
-                                    status_var.set("已扫码，等待确认...")
-                                else:
-                                    status_var.set(f"未知状态: {code}")
-                            except Exception as e:
-                                status_var.set(f"网络错误: {e}")
-                                # 清理二维码临时文件
-                                cleanup_qrcode_files()
-                                break
-                            time.sleep(2)
+                        # B站只提供HTTP轮询：等待扫码期间间隔从1秒逐步加倍到5秒，状态变化后重新从1秒开始；
+                        # 已扫码等待确认时用户正在操作，缩短为0.4秒
+                        delay = 1.0
+                        last_code = None
+                        # 最长轮询180秒（二维码本身也会在此时失效），窗口被遗忘时不会让线程一直运行
+                        deadline = time.monotonic() + 180
+                        # 无论以何种方式结束轮询（成功、失效、超时、出错、取消），都在主线程中清理二维码临时文件
+                        try:
+                            while True:
+                                try:
+                                    if cancel.is_set():
+                                        return
+                                    if time.monotonic() > deadline:
+                                        set_status("二维码已超时，请重新登录")
+                                        return
+                                    rst = sess.get(f'https://passport.bilibili.com/x/passport-login/web/qrcode/poll?qrcode_key={token}', timeout=_HTTP_TIMEOUT)
+                                    # 空响应或返回的不是正常数据（网络抖动、临时错误）时不中断登录，等待后重试
+                                    j = None
+                                    if rst.content:
+                                        try:
+                                            j = rst.json()
+                                        except ValueError:
+                                            pass
+                                    data = j.get('data') if isinstance(j, dict) else None
+                                    if not isinstance(data, dict):
+                                        if cancel.wait(delay):
+                                            return
+                                        continue
+                                    code = data.get('code')
+                                    if code == 0:
+                                        set_status("扫码成功，正在登录...")
+                                        config['refresh_token'] = data.get('refresh_token', '')
+                                        config['Cookies'] = {co.name: co.value for co in rst.cookies}
+                                        # 登录信息交给配置写入线程保存，不让磁盘写入拖慢窗口关闭
+                                        self.persist_config(config)
+                                        set_status("登录成功！")
+                                        self.add_log("扫码登录成功")
+                                        # 2秒后隐藏窗口（期间若已开始新的登录则不隐藏）
+                                        login_window.after(2000, lambda: self._login_cancel is cancel and self.hide_login_window())
+                                        return
+                                    elif code == 86038:
+                                        set_status("二维码已失效，请重新获取")
+                                        return
+                                    elif code == 86090:
+                                        set_status("等待扫码...")
+                                    elif code == 86101:
+                                        set_status("已扫码，等待确认...")
+                                    else:
+                                        set_status(f"未知状态: {code}")
+                                    if code == 86101:
+                                        delay = 0.4
+                                    else:
+                                        delay = 1.0 if code != last_code else min(delay * 2, 5.0)
+                                    last_code = code
+                                except Exception as e:
+                                    set_status(f"网络错误: {e}")
+                                    return
+                                if cancel.wait(delay):
+                                    return
+                        finally:
+                            login_window.after(0, self.cleanup_qrcode_files)
                     
-                    import threading
                     poll_thread = threading.Thread(target=poll_qrcode, daemon=True)
                     poll_thread.start()
                     
@@ -907,7 +1295,7 @@ class BilibiliCacheGUI:
                     status_var.set(f"登录失败: {e}")
                     self.add_log(f"扫码登录失败: {e}")
                     # 清理二维码临时文件
-                    cleanup_qrcode_files()
+                    self.cleanup_qrcode_files()
             perform_login()
             
         except Exception as e:
@@ -0,0 +1,93 @@
+"""bilibili_cache.py 的动态轮询测试"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bilibili_cache  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+class FakeSession:
+    """每次都报告"自上次以来0条更新"，但动态列表里始终有一条视频投稿"""
+
+    def __init__(self):
+        self.params = []
+
+    def get(self, url, params=None, **kwargs):
+        self.params.append(params)
+        body = {'code': 0, 'data': {
+            'update_baseline': '100',
+            'update_num': 0,
+            'items': [{'type': 'DYNAMIC_TYPE_AV',
+                       'modules': {'module_dynamic': {'major': {'archive': {'bvid': 'BV1test'}}}}}],
+        }}
+        return FakeResponse(json.dumps(body).encode())
+
+
+def make_cache(tmp_path, **config):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'headers': {}, 'Cookies': {}, **config}), encoding='utf-8')
+    cache = bilibili_cache.BilibiliCache(str(path))
+    cache._sess = FakeSession()
+    return cache
+
+
+def test_update_baseline_disabled_by_default(tmp_path):
+    cache = make_cache(tmp_path)
+    for _ in range(3):
+        assert cache.fetch_dynamic(1) == ['BV1test']
+    assert cache._sess.params == [None, None, None]
+
+
+def test_update_baseline_forces_full_fetch_periodically(tmp_path):
+    cache = make_cache(tmp_path, use_update_baseline=True)
+    results = [cache.fetch_dynamic(1) for _ in range(2 * cache.FULL_FETCH_EVERY + 1)]
+    # 第一次没有基线，完整处理；之后每FULL_FETCH_EVERY次强制完整处理一次
+    full = [i for i, r in enumerate(results) if r == ['BV1test']]
+    assert full == [0, cache.FULL_FETCH_EVERY, 2 * cache.FULL_FETCH_EVERY]
+    assert all(r == [] for i, r in enumerate(results) if i not in full)
+    assert cache._sess.params[1] == {'update_baseline': '100'}
+
+
+def test_config_cache_not_shared_between_instances(tmp_path):
+    first = make_cache(tmp_path, bupid=[1])
+    first.config['bupid'].append(2)
+    first.config['headers']['X-Test'] = '1'
+    second = bilibili_cache.BilibiliCache(first.config_path)
+    assert second.config['bupid'] == [1]
+    assert second.config['headers'] == {}
+
+
+def test_mark_seen_prunes_seen_db(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.SEEN_CAP = 5
+    cache.SEEN_PRUNE_EVERY = 3
+    for i in range(20):
+        cache.mark_seen(f'BV{i}')
+        count = cache._seen_db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+        assert count < cache.SEEN_CAP + cache.SEEN_PRUNE_EVERY
+
+
+def test_stop_closes_seen_db(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.running = True
+    cache._dl_pool = ThreadPoolExecutor(max_workers=1)
+    cache.stop_dynamic_monitor()
+    deadline = time.monotonic() + 5
+    while cache._seen_db is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache._seen_db is None
+    # 停止后完成的下载仍能写入（重新打开seen.db）
+    cache.mark_seen('BV1late')
+    assert cache._seen_db.execute('SELECT bvid FROM seen').fetchall() == [('BV1late',)]
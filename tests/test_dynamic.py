@@ -0,0 +1,82 @@
+"""Dynamic.py 的接口解析测试"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('pyqrcode')
+import Dynamic  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+        self.cookies = {}
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def make_dynamic(response):
+    """不经过__init__/init（不打开标题缓存、不读配置文件）构造一个只用于调用getdata的对象"""
+    obj = Dynamic.Dynamic.__new__(Dynamic.Dynamic)
+    obj.sess = FakeSession(response)
+    obj.stop_event = threading.Event()
+    obj.CONFIG = {'is_log': False}
+    obj.logs = []
+    obj.log = obj.logs.append
+    return obj
+
+
+@pytest.mark.parametrize('body', [b'<html>412 Precondition Failed</html>', b''])
+def test_parse_json_raises_request_exception_on_non_json(body):
+    obj = make_dynamic(FakeResponse(body))
+    with pytest.raises(requests.exceptions.RequestException):
+        obj.parse_json(FakeResponse(body))
+
+
+@pytest.mark.parametrize('body', [b'<html>412 Precondition Failed</html>', b''])
+def test_getdata_survives_non_json_response(body):
+    obj = make_dynamic(FakeResponse(body, status_code=412))
+    # 不应抛出异常（否则会中断start()中的pool.map，结束整个监控循环）
+    assert obj.getdata(12345) is None
+    assert obj.sess.calls == 1
+    assert any('12345' in str(line) for line in obj.logs)
+
+
+def test_relogin_checks_cookie_once_per_round():
+    obj = make_dynamic(FakeResponse(b'{}'))
+    obj.interactive_login = True
+    obj._login_lock = threading.Lock()
+    obj._login_request = threading.Event()
+    obj._cookie_checked = False
+    checks, logins = [], []
+    obj.check_cookie_valid = lambda: checks.append(1) or False
+    obj.login = lambda: logins.append(1)
+
+    # 多个轮询线程同时遇到-101，只校验一次并请求主线程登录
+    threads = [threading.Thread(target=obj.relogin) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(checks) == 1
+    assert obj._login_request.is_set()
+    assert logins == []
+
+    # 主线程处理登录请求时不再重复校验
+    obj.relogin(known_invalid=True)
+    assert len(checks) == 1
+    assert logins == [1]